@@ -1,10 +1,3 @@
 #!/bin/bash
 
-python assembler.py ./examples/add/Add.asm
-python assembler.py ./examples/add/AddL.asm
-python assembler.py ./examples/max/Max.asm
-python assembler.py ./examples/max/MaxL.asm
-python assembler.py ./examples/pong/Pong.asm
-python assembler.py ./examples/pong/PongL.asm
-python assembler.py ./examples/rect/Rect.asm
-python assembler.py ./examples/rect/RectL.asm
+python assembler.py ./examples
@@ -1,76 +1,178 @@
-# -*- coding: utf-8 -*-
-
-import os, sys
-sys.path.append(os.getcwd())
-
-from assembler.parser import Parser, CommandType
-from assembler.code import dest, comp, jump
-
-def assemble_without_st(path: str):
-    parser = Parser(path)
-    with open(path.replace(".asm", ".hack"), "w") as f:
-        while parser.hasMoreCommands():
-            parser.advance()
-            if parser.commandType() == CommandType.A_COMMAND:
-                symbol = parser.symbol()
-                assert symbol.isdigit()
-                addr = int(symbol)
-                assert addr >= 0 and addr < 2**15
-                f.write(f"0{addr:015b}\n")
-            elif parser.commandType() == CommandType.C_COMMAND:
-                c = comp(parser.comp())
-                d = dest(parser.dest())
-                j = jump(parser.jump())
-                f.write(f"111{c}{d}{j}\n")
-            elif parser.commandType() == CommandType.L_COMMAND:
-                pass
-
-def assemble_with_st(path: str):
-    from assembler.symbol_table import SymbolTable
-    symbol_table = SymbolTable()
-    parser = Parser(path)
-    while parser.hasMoreCommands():
-        parser.advance()
-        if parser.commandType() == CommandType.L_COMMAND:
-            symbol = parser.symbol()
-            if not symbol.isdigit():
-                symbol_table.addEntry(symbol, parser.index())
-    parser.reset()
-
-    with open(path.replace(".asm", ".hack"), "w") as f:
-        while parser.hasMoreCommands():
-            parser.advance()
-            if parser.commandType() == CommandType.A_COMMAND:
-                symbol = parser.symbol()
-                if symbol.isdigit():
-                    addr = int(symbol)
-                    assert addr >= 0 and addr < 2**15
-                else:
-                    symbol_table.addEntry(symbol)
-                    addr = symbol_table.getAddress(symbol)
-                f.write(f"0{addr:015b}\n")
-            elif parser.commandType() == CommandType.C_COMMAND:
-                c = comp(parser.comp())
-                d = dest(parser.dest())
-                j = jump(parser.jump())
-                f.write(f"111{c}{d}{j}\n")
-    # from pprint import pprint
-    # pprint(symbol_table.table)
-
-
-def assemble(path: str):
-    use_symbol = True
-    if path.endswith("L.asm"):
-        use_symbol = False
-    elif not path.endswith(".asm"):
-        print("not asm file.")
-        raise IOError()
-
-    if use_symbol:
-        assemble_with_st(path)
-    else:
-        assemble_without_st(path)
-
-
-arguments = sys.argv[1:]
-assemble(arguments[0])
+# -*- coding: utf-8 -*-
+
+import os, sys, time
+sys.path.append(os.getcwd())
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import List, Tuple, Union
+
+from assembler.parser import Parser, CommandType
+
+def assemble_without_st(path: str):
+    parser = Parser(path)
+    with open(path.replace(".asm", ".hack"), "w") as f:
+        for instruction in parser.instructions:
+            if instruction.kind == CommandType.A_COMMAND:
+                assert instruction.code is not None
+                f.write(f"0{instruction.code:015b}\n")
+            elif instruction.kind == CommandType.C_COMMAND:
+                f.write(f"{instruction.code:016b}\n")
+
+def assemble_with_st(path: str):
+    from assembler.symbol_table import SymbolTable
+    symbol_table = SymbolTable()
+    parser = Parser(path)
+    while parser.hasMoreCommands():
+        parser.advance()
+        if parser.commandType() == CommandType.L_COMMAND:
+            symbol = parser.symbol()
+            if not symbol.isdigit():
+                symbol_table.addEntry(symbol, parser.index())
+
+    with open(path.replace(".asm", ".hack"), "w") as f:
+        for instruction in parser.instructions:
+            if instruction.kind == CommandType.A_COMMAND:
+                addr = instruction.code
+                if addr is None:
+                    symbol_table.addEntry(instruction.symbol)
+                    addr = symbol_table.getAddress(instruction.symbol)
+                f.write(f"0{addr:015b}\n")
+            elif instruction.kind == CommandType.C_COMMAND:
+                f.write(f"{instruction.code:016b}\n")
+    # from pprint import pprint
+    # pprint(symbol_table.table)
+
+def assemble_streaming(
+    path: str, binary: bool = False, header: bool = True, cache_dir: Union[str, None] = None
+):
+    from assembler.stream import assemble_stream
+    from assembler.image import write_hack_text, write_image
+    from assembler.cache import AssemblyCache
+
+    # with a cache, the source is hashed in chunks first and only assembled
+    # on a miss. Either way it is fed line by line from the file, never
+    # held in memory as a whole.
+    cache = AssemblyCache(cache_dir or None) if cache_dir is not None else None
+    key = cache.key(path) if cache else None
+    entry = cache.get(key) if cache else None
+    if entry is not None:
+        words, symbol_table = entry
+    else:
+        with open(path) as f:
+            asm = assemble_stream(f)
+        words = asm.words
+        symbol_table = asm.symbol_table
+        if cache:
+            cache.put(key, words, symbol_table)
+
+    if binary:
+        write_image(output_path(path, True), words, symbol_table, header)
+    else:
+        write_hack_text(output_path(path), words)
+
+
+def assemble(
+    path: str,
+    stream: bool = False,
+    binary: bool = False,
+    header: bool = True,
+    cache_dir: Union[str, None] = None,
+):
+    use_symbol = True
+    if path.endswith("L.asm"):
+        use_symbol = False
+    elif not path.endswith(".asm"):
+        print("not asm file.")
+        raise IOError()
+
+    if stream or binary or cache_dir is not None:
+        assemble_streaming(path, binary, header, cache_dir)
+    elif use_symbol:
+        assemble_with_st(path)
+    else:
+        assemble_without_st(path)
+
+
+def output_path(path: str, binary: bool = False) -> str:
+    return path.replace(".asm", ".rom" if binary else ".hack")
+
+
+def collect_asm_files(paths: List[str]) -> List[str]:
+    asm_files: List[str] = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                asm_files.extend(os.path.join(root, file) for file in files if file.endswith(".asm"))
+        else:
+            asm_files.append(path)
+    return sorted(set(asm_files))
+
+
+def assemble_timed(
+    path: str, stream: bool, binary: bool, header: bool, cache_dir: Union[str, None]
+) -> Tuple[str, float, int, Union[str, None]]:
+    start = time.perf_counter()
+    try:
+        assemble(path, stream, binary, header, cache_dir)
+    except Exception as e:
+        return path, time.perf_counter() - start, 0, f"{type(e).__name__}: {e}"
+    return path, time.perf_counter() - start, os.path.getsize(output_path(path, binary)), None
+
+
+def assemble_batch(
+    paths: List[str],
+    stream: bool,
+    binary: bool,
+    header: bool,
+    cache_dir: Union[str, None] = None,
+    jobs: Union[int, None] = None,
+) -> bool:
+    asm_files = collect_asm_files(paths)
+    if len(asm_files) < 1:
+        print(f"no asm files in: {' '.join(paths)}")
+        return False
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        results = list(executor.map(
+            partial(assemble_timed, stream=stream, binary=binary, header=header, cache_dir=cache_dir), asm_files
+        ))
+    elapsed = time.perf_counter() - start
+
+    failed = 0
+    for path, seconds, size, error in results:
+        if error is None:
+            print(f"  ok    {seconds * 1000:8.1f} ms {os.path.getsize(path):9d} -> {size:9d} bytes  {path}")
+        else:
+            failed += 1
+            print(f"  FAIL  {seconds * 1000:8.1f} ms  {path}: {error}")
+    print(f"{len(results) - failed}/{len(results)} assembled in {elapsed * 1000:.1f} ms")
+    return failed == 0
+
+
+def main():
+    arguments = sys.argv[1:]
+    stream = "--stream" in arguments
+    binary = "--binary" in arguments or "--raw" in arguments
+    header = "--raw" not in arguments
+    jobs = None
+    cache_dir = None  # "" selects the default cache directory
+    for argument in arguments:
+        if argument.startswith("--jobs="):
+            jobs = int(argument.removeprefix("--jobs="))
+        elif argument == "--cache" or argument.startswith("--cache="):
+            cache_dir = argument.removeprefix("--cache").removeprefix("=")
+    arguments = [argument for argument in arguments if not argument.startswith("--")]
+    if len(arguments) < 1:
+        print("no path in argument")
+        sys.exit(1)
+
+    if len(arguments) == 1 and not os.path.isdir(arguments[0]):
+        assemble(arguments[0], stream, binary, header, cache_dir)
+    elif not assemble_batch(arguments, stream, binary, header, cache_dir, jobs):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import os
+import tempfile
+from array import array
+from typing import Callable, Tuple, TypeVar, Union
+
+from .image import load_image, write_image
+from .symbol_table import SymbolTable
+
+# bump whenever the encoding or symbol allocation changes, so stale entries
+# produced by an older assembler are never served.
+ASSEMBLER_VERSION = 2
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "hack-assembler")
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+T = TypeVar("T")
+
+
+class DirectoryCache:
+    """
+    A directory of cache entries, one file per key named `<key><suffix>`.
+
+    `load()` touches the entry it reads, and `store()` writes an entry
+    atomically and then evicts the least recently used entries once the
+    directory grows past `max_bytes`. Subclasses pick the keys and the
+    format of the entries.
+    """
+
+    suffix = ".entry"
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def load(self, key: str, read: Callable[[str], T]) -> Union[T, None]:
+        """`read(path)` of the entry, None when there is none."""
+        path = self._path(key)
+        try:
+            entry = read(path)
+            os.utime(path)
+        except FileNotFoundError:  # never stored, or evicted by another process
+            return None
+        return entry
+
+    def store(self, key: str, write: Callable[[str], None]) -> None:
+        """Stores the entry `write(path)` writes to the given path."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        write(tmp_path)
+        os.replace(tmp_path, self._path(key))
+        self.evict()
+
+    def evict(self) -> None:
+        entries = []
+        for file in os.listdir(self.directory):
+            if not file.endswith(self.suffix):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, file))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, file))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, file in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, file))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}{self.suffix}")
+
+
+class AssemblyCache(DirectoryCache):
+    """
+    On-disk cache of assembled word images and their symbol tables.
+
+    Entries are binary ROM images named after the hash of the source text
+    and the assembler version.
+    """
+
+    suffix = ".rom"
+
+    def __init__(self, directory: Union[str, None] = None, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        super().__init__(directory or os.environ.get("HACK_ASM_CACHE", DEFAULT_CACHE_DIR), max_bytes)
+
+    def key(self, path: str, chunk_size: int = 1 << 16) -> str:
+        """The hash of the source in `path`, read in chunks."""
+        digest = hashlib.sha256(f"hack-assembler-{ASSEMBLER_VERSION}\0".encode())
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Union[Tuple[array, SymbolTable], None]:
+        return self.load(key, load_image)
+
+    def put(self, key: str, words: array, symbol_table: SymbolTable) -> None:
+        self.store(key, lambda path: write_image(path, words, symbol_table))
@@ -1,5 +1,8 @@
 # -*- coding: utf-8 -*-
 
+from itertools import permutations
+from typing import Dict
+
 DEST_MNEMONICS = "ADM"
 COMP_MNEMONICS_MAP = {
       "0":   "0101010",
@@ -43,20 +46,51 @@ JMP_MNEMONICS_MAP = {
     "JMP": "111",
 }
 
+def _commuted(mnemonic: str) -> str:
+    if len(mnemonic) == 3 and mnemonic[1] in "+&|":
+        return mnemonic[2] + mnemonic[1] + mnemonic[0]
+    return mnemonic
+
+COMP_CODES: Dict[str, int] = {
+    **{_commuted(mnemonic): int(bits, 2) for mnemonic, bits in COMP_MNEMONICS_MAP.items()},
+    **{mnemonic: int(bits, 2) for mnemonic, bits in COMP_MNEMONICS_MAP.items()},
+}
+
+DEST_CODES: Dict[str, int] = {
+    "".join(order): sum(1 << (2 - DEST_MNEMONICS.index(m)) for m in order)
+    for n in range(len(DEST_MNEMONICS) + 1)
+    for order in permutations(DEST_MNEMONICS, n)
+}
+
+JMP_CODES: Dict[str, int] = {
+    mnemonic: int(bits, 2) for mnemonic, bits in JMP_MNEMONICS_MAP.items()
+}
+
+# full C-instruction text ("dest=comp;jump", with empty parts omitted) to word
+C_INSTRUCTION_CODES: Dict[str, int] = {
+    (f"{d}=" if d else "") + c + (f";{j}" if j else ""):
+        0b111 << 13 | comp_code << 6 | dest_code << 3 | jump_code
+    for c, comp_code in COMP_CODES.items()
+    for d, dest_code in DEST_CODES.items()
+    for j, jump_code in JMP_CODES.items()
+}
+
+def encode(instruction: str) -> int:
+    code = C_INSTRUCTION_CODES.get(instruction)
+    assert code is not None, instruction
+    return code
+
+_DEST_BITS = {mnemonic: f"{code:03b}" for mnemonic, code in DEST_CODES.items()}
+_COMP_BITS = {mnemonic: f"{code:07b}" for mnemonic, code in COMP_CODES.items()}
+
 def dest(mnemonic: str) -> str:
-    bits = ""
-    for dest_mnemonic in DEST_MNEMONICS:
-        bits += "1" if dest_mnemonic in mnemonic else "0"
-    return bits
+    assert mnemonic in _DEST_BITS
+    return _DEST_BITS[mnemonic]
 
 def comp(mnemonic: str) -> str:
-    if mnemonic in  COMP_MNEMONICS_MAP:
-        return COMP_MNEMONICS_MAP[mnemonic]
-    elif "-" in mnemonic and mnemonic[::-1] in COMP_MNEMONICS_MAP:
-        return COMP_MNEMONICS_MAP[mnemonic[::-1]]
-    assert False
+    assert mnemonic in _COMP_BITS
+    return _COMP_BITS[mnemonic]
 
 def jump(mnemonic: str) -> str:
-    if mnemonic in JMP_MNEMONICS_MAP:
-        return JMP_MNEMONICS_MAP[mnemonic]
-    assert False
+    assert mnemonic in JMP_MNEMONICS_MAP
+    return JMP_MNEMONICS_MAP[mnemonic]
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+from collections import defaultdict
+from typing import Dict, Iterable, List, Union
+
+from .code import COMP_MNEMONICS_MAP, JMP_MNEMONICS_MAP
+from .symbol_table import SymbolTable
+
+COMP_BY_CODE: Dict[int, str] = {int(bits, 2): mnemonic for mnemonic, bits in COMP_MNEMONICS_MAP.items()}
+JMP_BY_CODE: Dict[int, str] = {int(bits, 2): mnemonic for mnemonic, bits in JMP_MNEMONICS_MAP.items()}
+# dest bits d1 d2 d3 are A D M, written in the book's order A, M, D
+DEST_BY_CODE: Dict[int, str] = {
+    code: "".join(m for m, bit in (("A", 0b100), ("M", 0b001), ("D", 0b010)) if code & bit)
+    for code in range(8)
+}
+
+
+def _c_text(low_bits: int) -> str:
+    comp = COMP_BY_CODE.get(low_bits >> 6)
+    if comp is None:
+        return f"<comp {low_bits >> 6:07b}>"
+    dest = DEST_BY_CODE[(low_bits >> 3) & 0b111]
+    jump = JMP_BY_CODE[low_bits & 0b111]
+    text = f"{dest}={comp}" if dest else comp
+    return f"{text};{jump}" if jump else text
+
+# C-instruction text indexed by the low 13 bits (comp, dest, jump)
+C_INSTRUCTION_TEXT: List[str] = [_c_text(low_bits) for low_bits in range(1 << 13)]
+
+
+def disassemble(words: Iterable[int]) -> List[str]:
+    texts = C_INSTRUCTION_TEXT
+    return [f"@{word}" if word < 0x8000 else texts[word & 0x1FFF] for word in words]
+
+
+def listing(words: Iterable[int], symbol_table: Union[SymbolTable, None] = None) -> List[str]:
+    """
+    Builds a listing with ROM address, word and instruction per line.
+    With a symbol table, labels are printed above the address they mark and
+    A-instructions are annotated with the names of the value they load:
+    labels first when the next instruction jumps, variables first otherwise.
+    """
+    words = list(words)
+    labels_at: Dict[int, List[str]] = defaultdict(list)
+    variables_at: Dict[int, List[str]] = defaultdict(list)
+    if symbol_table is not None:
+        for symbol, address in symbol_table.table.items():
+            if symbol in symbol_table.labels:
+                labels_at[address].append(symbol)
+            else:
+                variables_at[address].append(symbol)
+
+    texts = C_INSTRUCTION_TEXT
+    lines = []
+    for address, word in enumerate(words):
+        for label in labels_at.get(address, ()):
+            lines.append(f"({label})")
+        if word >= 0x8000:
+            lines.append(f"{address:05d}  {word:016b}  {texts[word & 0x1FFF]}")
+            continue
+
+        next_word = words[address + 1] if address + 1 < len(words) else 0
+        if next_word >= 0x8000 and next_word & 0b111:
+            names = labels_at.get(word) or variables_at.get(word)
+        else:
+            names = variables_at.get(word) or labels_at.get(word)
+        text = f"@{word}"
+        if names:
+            text = f"{text:<16}// {', '.join(names)}"
+        lines.append(f"{address:05d}  {word:016b}  {text}")
+    return lines
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+"""
+ROM image formats.
+
+text   : the usual `.hack` file, one 16 character binary string per line.
+binary : little-endian 16 bit words. An optional 16 byte header in front
+         carries the word count and the offset of a symbol section that
+         follows the words, so the words always start at a fixed offset
+         and the image can be mmapped directly.
+
+    header  : magic "HACK", u16 version, u16 flags, u32 word count,
+              u32 symbol section offset (0 when there are no symbols)
+    words   : word count * u16
+    symbols : u32 count, then per symbol u16 address, u8 length, name,
+              with FLAG_SYMBOL_KINDS also a u8 kind before the name,
+              SYMBOL_LABEL or SYMBOL_VARIABLE
+
+Images written before FLAG_SYMBOL_KINDS carry no kinds, their symbols
+load as variables.
+"""
+
+import mmap
+import struct
+import sys
+from array import array
+from typing import Tuple, Union
+
+from .symbol_table import SymbolTable
+
+MAGIC = b"HACK"
+VERSION = 1
+HEADER = struct.Struct("<4sHHII")
+SYMBOL = struct.Struct("<HB")
+SYMBOL_WITH_KIND = struct.Struct("<HBB")
+FLAG_SYMBOL_KINDS = 0x0001
+SYMBOL_VARIABLE = 0
+SYMBOL_LABEL = 1
+
+
+def write_hack_text(path: str, words: array) -> None:
+    with open(path, "w") as f:
+        f.write("".join(f"{word:016b}\n" for word in words))
+
+
+def load_hack_text(path: str) -> array:
+    words = array("H")
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if len(line) != 0:
+                words.append(int(line, 2))
+    return words
+
+
+def write_image(
+    path: str,
+    words: array,
+    symbol_table: Union[SymbolTable, None] = None,
+    header: bool = True,
+) -> None:
+    data = _to_little_endian(words)
+    with open(path, "wb") as f:
+        if not header:
+            f.write(data)
+            return
+        symbols = symbol_table is not None and len(symbol_table.table) > 0
+        symbol_data = _pack_symbols(symbol_table) if symbols else b""
+        symbols_offset = HEADER.size + len(data) if symbols else 0
+        f.write(
+            HEADER.pack(MAGIC, VERSION, FLAG_SYMBOL_KINDS, len(words), symbols_offset)
+            + data
+            + symbol_data
+        )
+
+
+def load_image(path: str) -> Tuple[array, SymbolTable]:
+    """The words of a binary image and its symbols, an empty table without."""
+    with open(path, "rb") as f:
+        data = f.read()
+    offset, count, symbols_offset, flags = _words_span(data)
+    words = array("H")
+    words.frombytes(data[offset : offset + 2 * count])
+    if sys.byteorder != "little":
+        words.byteswap()
+    symbol_table = SymbolTable()
+    if symbols_offset:
+        _unpack_symbols(data, symbols_offset, flags & FLAG_SYMBOL_KINDS != 0, symbol_table)
+    return words, symbol_table
+
+
+def map_image(path: str) -> memoryview:
+    """Maps the words of a binary image read-only, without copying them."""
+    assert sys.byteorder == "little"
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    offset, count, _, _ = _words_span(mm)
+    return memoryview(mm)[offset : offset + 2 * count].cast("H")
+
+
+def load_rom(path: str) -> array:
+    """Loads either a `.hack` text file or a binary image."""
+    return load_rom_symbols(path)[0]
+
+
+def load_rom_symbols(path: str) -> Tuple[array, SymbolTable]:
+    """load_rom() and the symbols of a binary image, none for text files."""
+    with open(path, "rb") as f:
+        head = f.read(HEADER.size)
+    if path.endswith(".hack") and not head.startswith(MAGIC):
+        return load_hack_text(path), SymbolTable()
+    return load_image(path)
+
+
+def _to_little_endian(words: array) -> bytes:
+    if sys.byteorder == "little":
+        return words.tobytes()
+    swapped = array("H", words)
+    swapped.byteswap()
+    return swapped.tobytes()
+
+
+def _words_span(data) -> Tuple[int, int, int, int]:
+    # word offset, word count, symbol section offset, flags
+    if len(data) >= HEADER.size and data[:4] == MAGIC:
+        _, version, flags, count, symbols_offset = HEADER.unpack_from(data)
+        assert version == VERSION
+        return HEADER.size, count, symbols_offset, flags
+    assert len(data) % 2 == 0
+    return 0, len(data) // 2, 0, 0
+
+
+def _pack_symbols(symbol_table: SymbolTable) -> bytes:
+    parts = [struct.pack("<I", len(symbol_table.table))]
+    for symbol, address in symbol_table.table.items():
+        name = symbol.encode("ascii")
+        assert len(name) < 256
+        kind = SYMBOL_LABEL if symbol in symbol_table.labels else SYMBOL_VARIABLE
+        parts.append(SYMBOL_WITH_KIND.pack(address, len(name), kind) + name)
+    return b"".join(parts)
+
+
+def _unpack_symbols(data: bytes, offset: int, kinds: bool, symbol_table: SymbolTable) -> None:
+    entry = SYMBOL_WITH_KIND if kinds else SYMBOL
+    (count,) = struct.unpack_from("<I", data, offset)
+    offset += 4
+    for _ in range(count):
+        address, length, *kind = entry.unpack_from(data, offset)
+        offset += entry.size
+        symbol = data[offset : offset + length].decode("ascii")
+        offset += length
+        symbol_table.table[symbol] = address
+        if kind == [SYMBOL_LABEL]:
+            symbol_table.labels.add(symbol)
@@ -2,6 +2,9 @@
 
 from os.path import exists
 from enum import Enum
+from typing import Iterable, List, Union
+
+from .code import encode
 
 
 class CommandType(Enum):
@@ -10,6 +13,75 @@ class CommandType(Enum):
     L_COMMAND = 2
 
 
+class Instruction:
+    """
+    One tokenized source line.
+
+    symbol : A/L commands, the symbol or number after '@' / inside '()'
+    dest, comp, jump : C commands, the mnemonic fields
+    code : C commands, the encoded word. A commands with a number, the address.
+    """
+
+    __slots__ = ("kind", "symbol", "dest", "comp", "jump", "code", "line_number")
+
+    def __init__(
+        self,
+        kind: CommandType,
+        symbol: Union[str, None] = None,
+        dest: str = "",
+        comp: str = "",
+        jump: str = "",
+        code: Union[int, None] = None,
+        line_number: int = 0,
+    ) -> None:
+        self.kind = kind
+        self.symbol = symbol
+        self.dest = dest
+        self.comp = comp
+        self.jump = jump
+        self.code = code
+        self.line_number = line_number
+
+    def text(self) -> str:
+        if self.kind == CommandType.A_COMMAND:
+            return f"@{self.symbol}"
+        elif self.kind == CommandType.L_COMMAND:
+            return f"({self.symbol})"
+        text = f"{self.dest}={self.comp}" if self.dest else self.comp
+        return f"{text};{self.jump}" if self.jump else text
+
+
+def parse_line(line: str, line_number: int = 0) -> Union[Instruction, None]:
+    line = line.split("//")[0].strip()
+    if len(line) == 0:
+        return None
+
+    if line.startswith("@"):
+        symbol = line[1:]
+        code = None
+        if symbol.isdigit():
+            code = int(symbol)
+            assert code >= 0 and code < 2**15
+        return Instruction(CommandType.A_COMMAND, symbol, code=code, line_number=line_number)
+    elif line.startswith("(") and line.endswith(")"):
+        return Instruction(CommandType.L_COMMAND, line[1:-1].strip(), line_number=line_number)
+
+    dest, _, rest = line.rpartition("=")
+    comp, _, jump = rest.partition(";")
+    return Instruction(
+        CommandType.C_COMMAND, None, dest, comp, jump, encode(line), line_number
+    )
+
+
+def parse_lines(lines: Iterable[str]) -> List[Instruction]:
+    instructions = []
+    for line_number, line in enumerate(lines, 1):
+        instruction = parse_line(line, line_number)
+        if instruction is not None:
+            instructions.append(instruction)
+    return instructions
+
+
 class Parser:
     def __init__(self, path: str) -> None:
 
@@ -19,74 +91,43 @@ class Parser:
             raise FileNotFoundError()
 
         with open(path) as f:
-            self.lines = f.readlines()
-            self.line_index = 0
-            self.line = self.lines[0]
-            self.code_line_index = 0
+            self.instructions = parse_lines(f)
+        self.reset()
 
     def hasMoreCommands(self) -> bool:
-        return self.line_index < (len(self.lines) - 1) 
+        return self.instruction_index < len(self.instructions)
 
     def index(self) -> int:
         return self.code_line_index
 
     def advance(self) -> None:
         assert self.hasMoreCommands()
-        self._get_next_line()
-        while len(self.line) == 0:
-            self._get_next_line()
-            
-        if self.commandType() != CommandType.L_COMMAND:
+        self.instruction = self.instructions[self.instruction_index]
+        self.instruction_index += 1
+
+        if self.instruction.kind != CommandType.L_COMMAND:
             self.code_line_index += 1
 
     def commandType(self) -> CommandType:
-        if self.line.startswith("@"):
-            return CommandType.A_COMMAND
-        elif self.line.startswith("(") and self.line.endswith(")"):
-            return CommandType.L_COMMAND
-        else:
-            return CommandType.C_COMMAND
+        return self.instruction.kind
 
     def symbol(self) -> str:
-        assert self.commandType() != CommandType.C_COMMAND
-        sb = None
-        if self.commandType() == CommandType.L_COMMAND:
-            return self.line[1:-1].strip()
-        else:
-            return self.line[1:]
+        assert self.instruction.kind != CommandType.C_COMMAND
+        return self.instruction.symbol
 
     def dest(self) -> str:
-        assert self.commandType() == CommandType.C_COMMAND
-        tokens = self.line.split("=")
-        assert len(tokens) > 0 and len(tokens) < 3
-        if len(tokens) == 1:  # no '='
-            return ""
-        else:  # has '='
-            return tokens[0]
+        assert self.instruction.kind == CommandType.C_COMMAND
+        return self.instruction.dest
 
     def comp(self) -> str:
-        assert self.commandType() == CommandType.C_COMMAND
-        tokens = self.line.split("=")
-        assert len(tokens) > 0 and len(tokens) < 3
-        if len(tokens) == 1:  # no '='
-            return tokens[0].split(";")[0]
-        else: # has '='
-            return tokens[1].split(";")[0]
+        assert self.instruction.kind == CommandType.C_COMMAND
+        return self.instruction.comp
 
     def jump(self) -> str:
-        assert self.commandType() == CommandType.C_COMMAND
-        tokens = self.line.split(";")
-        assert len(tokens) < 3
-        if len(tokens) == 1:
-            return ""
-        else:
-            return tokens[1]
+        assert self.instruction.kind == CommandType.C_COMMAND
+        return self.instruction.jump
 
     def reset(self) -> None:
-        self.line_index = 0
+        self.instruction_index = 0
         self.code_line_index = 0
-        self.line = self.lines[0]
-
-    def _get_next_line(self) -> None:
-        self.line_index += 1
-        self.line = self.lines[self.line_index].split("//")[0].strip()
+        self.instruction = None
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+from array import array
+from typing import Dict, Iterable, List
+
+from .parser import CommandType, parse_line
+from .symbol_table import SymbolTable, PREDEFINED_SYMBOLS
+
+ROM_SIZE = 32768
+# A-instructions hold 15 bits, the top bit marks C-instructions
+ADDRESS_LIMIT = 2**15
+
+
+class StreamingAssembler:
+    """
+    Single pass assembler.
+
+    Lines are fed one at a time and encoded into a compact word buffer.
+    A-instructions referring to symbols that are not known yet are emitted
+    as placeholders and recorded in a fixup table, which is patched by
+    `finish()` once every label has been seen. Only the output words and
+    the pending fixups are kept in memory, never the source text.
+
+    `finish()` raises ValueError for a program that does not fit into ROM
+    or has a symbol no A-instruction can load.
+    """
+
+    def __init__(self) -> None:
+        self.words = array("H")
+        self.symbol_table = SymbolTable()
+        self.fixups: Dict[str, List[int]] = dict()
+
+    def feed(self, line: str) -> None:
+        instruction = parse_line(line)
+        if instruction is None:
+            return
+
+        if instruction.kind == CommandType.A_COMMAND:
+            addr = instruction.code
+            if addr is None:
+                addr = self._resolve(instruction.symbol)
+            self.words.append(addr)
+        elif instruction.kind == CommandType.L_COMMAND:
+            if not instruction.symbol.isdigit():
+                self.symbol_table.addEntry(instruction.symbol, len(self.words))
+        else:
+            self.words.append(instruction.code)
+
+    def feed_lines(self, lines: Iterable[str]) -> None:
+        for line in lines:
+            self.feed(line)
+
+    def finish(self) -> array:
+        # dict keeps insertion order, so variables are allocated in order of
+        # first reference, exactly like the two pass assembler does.
+        for symbol, positions in self.fixups.items():
+            self.symbol_table.addEntry(symbol)
+            addr = self.symbol_table.getAddress(symbol)
+            for position in positions:
+                self.words[position] = addr
+        self.fixups.clear()
+        self._check_size()
+        return self.words
+
+    def _check_size(self) -> None:
+        if len(self.words) > ROM_SIZE:
+            raise ValueError(f"program has {len(self.words)} words, the ROM holds {ROM_SIZE}")
+        for symbol, addr in self.symbol_table.table.items():
+            if addr >= ADDRESS_LIMIT:
+                raise ValueError(f"address {addr} of {symbol} does not fit into an A-instruction")
+
+    def _resolve(self, symbol: str) -> int:
+        if self.symbol_table.contains(symbol):
+            return self.symbol_table.getAddress(symbol)
+        if symbol in PREDEFINED_SYMBOLS:
+            self.symbol_table.addEntry(symbol)
+            return self.symbol_table.getAddress(symbol)
+        self.fixups.setdefault(symbol, []).append(len(self.words))
+        return 0
+
+
+def assemble_stream(lines: Iterable[str]) -> StreamingAssembler:
+    asm = StreamingAssembler()
+    asm.feed_lines(lines)
+    asm.finish()
+    return asm
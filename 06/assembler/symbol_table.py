@@ -32,6 +32,7 @@ class SymbolTable:
 
     def __init__(self) -> None:
         self.table = dict()
+        self.labels = set()
         self.next_variable_address = 16
 
     def addEntry(self, symbol: str, address: Union[int, None] = None) -> None:
@@ -39,6 +40,7 @@ class SymbolTable:
             return
         if address is not None:
             self.table[symbol] = address
+            self.labels.add(symbol)
             return
         
         if symbol in PREDEFINED_SYMBOLS:
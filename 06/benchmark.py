@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+import os, sys
+sys.path.append(os.getcwd())
+
+from time import perf_counter
+from timeit import timeit
+from typing import Callable, List
+
+from assembler.code import COMP_MNEMONICS_MAP, DEST_MNEMONICS, dest, comp, jump, encode
+from assembler.stream import ROM_SIZE, StreamingAssembler
+from hack import Emulator
+
+EXAMPLES_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "examples")
+DEFAULT_ASM = os.path.join(EXAMPLES_DIR, "pong", "Pong.asm")
+DEFAULT_ROM = os.path.join(EXAMPLES_DIR, "pong", "Pong.hack")
+DEFAULT_CYCLES = 3000000
+
+# small programs ending in the halt loop, with the cycles to reach it
+HALT_PROGRAMS = {
+    "jump into halt": (["@5", "D=A", "@END", "0;JMP", "(END)", "@END", "0;JMP"], 6),
+    "fall into halt": (["@5", "D=A", "(END)", "@END", "0;JMP"], 4),
+    "countdown, then fall into halt": (
+        ["@5", "D=A", "(L)", "@L", "D=D-1;JGT", "@7", "D=A", "(END)", "@END", "0;JMP"],
+        16,
+    ),
+}
+
+# programs around the ROM size, with whether finish() accepts them
+ROM_PROGRAMS = {
+    "full ROM": (["D=0"] * ROM_SIZE, True),
+    "one word over": (["D=0"] * (ROM_SIZE + 1), False),
+    "label past the last word": (["@END", "0;JMP", *["D=0"] * (ROM_SIZE - 2), "(END)"], False),
+}
+
+
+def c_instructions(path: str) -> List[str]:
+    instructions = []
+    with open(path) as f:
+        for line in f:
+            line = line.split("//")[0].strip()
+            if len(line) != 0 and not line.startswith("@") and not line.startswith("("):
+                instructions.append(line)
+    return instructions
+
+
+def encode_original(instruction: str) -> int:
+    # the per-instruction string building the assembler used before the
+    # precomputed tables, kept here as the baseline
+    d, _, rest = instruction.rpartition("=")
+    c, _, j = rest.partition(";")
+    d_bits = ""
+    for dest_mnemonic in DEST_MNEMONICS:
+        d_bits += "1" if dest_mnemonic in d else "0"
+    if c in COMP_MNEMONICS_MAP:
+        c_bits = COMP_MNEMONICS_MAP[c]
+    else:
+        c_bits = COMP_MNEMONICS_MAP[c[::-1]]
+    return int(f"111{c_bits}{d_bits}{jump(j)}", 2)
+
+
+def encode_string_api(instruction: str) -> int:
+    d, _, rest = instruction.rpartition("=")
+    c, _, j = rest.partition(";")
+    return int(f"111{comp(c)}{dest(d)}{jump(j)}", 2)
+
+
+def bench_encoders(path: str, repeat: int = 5) -> None:
+    instructions = c_instructions(path)
+    encoders: List[Callable[[str], int]] = [encode_original, encode_string_api, encode]
+    for encoder in encoders:
+        assert list(map(encoder, instructions)) == list(map(encode, instructions))
+
+    print(f"{path}: {len(instructions)} C-instructions")
+    for encoder in encoders:
+        seconds = timeit(lambda: list(map(encoder, instructions)), number=repeat) / repeat
+        print(f"  {encoder.__name__:<20} {seconds * 1e9 / len(instructions):8.1f} ns/instruction")
+
+
+def bench_emulator(path: str, cycles: int = DEFAULT_CYCLES) -> None:
+    print(f"{path}: {cycles} cycles")
+    states = []
+    for translate in (False, True):
+        emulator = Emulator(path, translate=translate)
+        start = perf_counter()
+        executed = emulator.run(cycles)
+        seconds = perf_counter() - start
+        states.append((emulator.pc, emulator.a, emulator.d, emulator.ram.tobytes()))
+        mode = f"translated ({len(emulator.blocks.blocks)} blocks)" if translate else "interpreted"
+        print(f"  {mode:<24} {executed / seconds / 1e6:6.2f} M instructions/s  ({seconds:.2f} s)")
+    assert states[0] == states[1]
+
+
+def check_halt() -> None:
+    """Checks both emulator modes count the cycles to the halt loop the same."""
+    for name, (lines, expected) in HALT_PROGRAMS.items():
+        assembler = StreamingAssembler()
+        assembler.feed_lines(lines)
+        words = assembler.finish()
+        for translate in (False, True):
+            emulator = Emulator(words, translate=translate)
+            emulator.run(1000)
+            assert emulator.halted and emulator.cycles == expected, (name, translate, emulator.cycles)
+        print(f"  {name:<32} {expected:>4} cycles ok")
+
+
+def check_rom_size() -> None:
+    """Checks the assembler rejects programs that do not fit into ROM."""
+    for name, (lines, fits) in ROM_PROGRAMS.items():
+        assembler = StreamingAssembler()
+        assembler.feed_lines(lines)
+        try:
+            assembler.finish()
+            error = None
+        except ValueError as e:
+            error = e
+        assert (error is None) == fits, (name, error)
+        print(f"  {name:<32} {'fits' if fits else error}")
+
+
+if __name__ == "__main__":
+    arguments = sys.argv[1:]
+    command = arguments[0] if len(arguments) > 0 else "all"
+    if command in ("encode", "all"):
+        bench_encoders(arguments[1] if len(arguments) > 1 else DEFAULT_ASM)
+    if command in ("halt", "all"):
+        check_halt()
+    if command in ("rom", "all"):
+        check_rom_size()
+    if command in ("emulator", "all"):
+        bench_emulator(
+            arguments[1] if len(arguments) > 1 else DEFAULT_ROM,
+            int(arguments[2]) if len(arguments) > 2 else DEFAULT_CYCLES,
+        )
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+import os, sys, time
+sys.path.append(os.getcwd())
+
+from assembler.disassembler import listing
+from assembler.image import load_rom_symbols
+from assembler.stream import StreamingAssembler
+
+
+def main():
+    arguments = sys.argv[1:]
+    asm_path = None
+    for argument in arguments:
+        if argument.startswith("--asm="):
+            asm_path = argument.removeprefix("--asm=")
+    arguments = [argument for argument in arguments if not argument.startswith("--")]
+    if len(arguments) < 1:
+        print("no rom in argument")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    words, image_symbols = load_rom_symbols(arguments[0])
+
+    symbol_table = None
+    if asm_path is None and image_symbols.table:
+        # binary images carry the symbols of the source they came from
+        symbol_table = image_symbols
+    elif asm_path is not None:
+        # re-assemble the source to recover its symbol table
+        asm = StreamingAssembler()
+        with open(asm_path) as f:
+            asm.feed_lines(f)
+        assert asm.finish() == words, f"{asm_path} does not assemble to {arguments[0]}"
+        symbol_table = asm.symbol_table
+
+    lines = listing(words, symbol_table)
+    sys.stdout.write("\n".join(lines) + "\n")
+    print(f"// {len(words)} words in {(time.perf_counter() - start) * 1000:.1f} ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+import os, sys, time
+sys.path.append(os.getcwd())
+
+from typing import List
+from hack import Emulator
+
+DEFAULT_CYCLES = 1000000
+
+
+def parse_addresses(arguments: List[str]) -> List[int]:
+    addresses: List[int] = []
+    for argument in arguments:
+        first, _, last = argument.partition("-")
+        addresses.extend(range(int(first), int(last or first) + 1))
+    return addresses
+
+
+def main():
+    arguments = sys.argv[1:]
+    cycles = DEFAULT_CYCLES
+    pokes = []
+    translate = "--interpret" not in arguments
+    for argument in arguments:
+        if argument.startswith("--cycles="):
+            cycles = int(argument.removeprefix("--cycles="))
+        elif argument.startswith("--set="):
+            address, _, value = argument.removeprefix("--set=").partition("=")
+            pokes.append((int(address), int(value)))
+    arguments = [argument for argument in arguments if not argument.startswith("--")]
+    if len(arguments) < 1:
+        print("no rom in argument")
+        sys.exit(1)
+
+    emulator = Emulator(arguments[0], translate)
+    for address, value in pokes:
+        emulator.poke(address, value)
+
+    start = time.perf_counter()
+    executed = emulator.run(cycles)
+    elapsed = time.perf_counter() - start
+
+    state = "halted" if emulator.halted else "stopped"
+    print(f"{state} after {executed} cycles at pc {emulator.pc} "
+          f"({executed / elapsed / 1e6:.2f} M instructions/s)")
+    for address in parse_addresses(arguments[1:]):
+        print(f"  RAM[{address}] = {emulator.peek_signed(address)}")
+
+
+if __name__ == "__main__":
+    main()
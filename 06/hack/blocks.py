@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+
+from array import array
+from typing import Callable, Dict, List, Union
+
+ADDRESS_MASK = 0x7FFF
+WORD_MASK = 0xFFFF
+
+# ALU expressions for the documented comp functions, over operands x (D) and
+# y (A or M). Other control bit combinations call the generic ALU function.
+ALU_EXPRESSIONS = {
+    0b101010: "0",
+    0b111111: "1",
+    0b111010: "65535",
+    0b001100: "{x}",
+    0b110000: "{y}",
+    0b001101: "{x} ^ 65535",
+    0b110001: "{y} ^ 65535",
+    0b001111: "-{x} & 65535",
+    0b110011: "-{y} & 65535",
+    0b011111: "({x} + 1) & 65535",
+    0b110111: "({y} + 1) & 65535",
+    0b001110: "({x} - 1) & 65535",
+    0b110010: "({y} - 1) & 65535",
+    0b000010: "({x} + {y}) & 65535",
+    0b010011: "({x} - {y}) & 65535",
+    0b000111: "({y} - {x}) & 65535",
+    0b000000: "{x} & {y}",
+    0b010101: "{x} | {y}",
+}
+
+JUMP_CONDITIONS = {
+    0b001: "0 < o < 32768",
+    0b010: "o == 0",
+    0b011: "o < 32768",
+    0b100: "o >= 32768",
+    0b101: "o != 0",
+    0b110: "o == 0 or o >= 32768",
+}
+
+
+class Block:
+    __slots__ = ("start", "length", "halts", "function")
+
+    def __init__(self, start: int, length: int, halts: bool, function: Callable) -> None:
+        self.start = start
+        self.length = length
+        self.halts = halts
+        self.function = function
+
+
+class BlockCache:
+    """
+    Translates straight-line runs of ROM into Python functions.
+
+    A block starts at a jump target (discovered when execution first reaches
+    it) and ends with the first jumping instruction. Its function takes
+    (ram, a, d) and returns (next pc, a, d) after executing the whole block.
+    A values loaded by A-instructions are folded into the generated code as
+    constants. Blocks are cached by start pc until `clear()`.
+    """
+
+    def __init__(self, rom: array, alu_functions: List[Callable[[int, int], int]]) -> None:
+        self.rom = rom
+        self.alu_functions = alu_functions
+        self.blocks: Dict[int, Block] = dict()
+
+    def clear(self) -> None:
+        self.blocks.clear()
+
+    def get(self, pc: int) -> Block:
+        block = self.blocks.get(pc)
+        if block is None:
+            block = self.blocks[pc] = self.translate(pc)
+        return block
+
+    def translate(self, start: int) -> Block:
+        rom = self.rom
+        lines = ["def block(ram, a, d):"]
+        known: Union[int, None] = None  # A value when known at translation time
+        a_expr = "a"
+        pc = start
+
+        while True:
+            instruction = rom[pc]
+            pc = (pc + 1) & ADDRESS_MASK
+
+            if instruction < 0x8000:
+                known = instruction
+                a_expr = str(known)
+                if pc == 0:
+                    return self._finish(lines, start, pc, a_expr, None)
+                continue
+
+            address = str(known & ADDRESS_MASK) if known is not None else "a & 32767"
+            y = f"ram[{address}]" if instruction & 0x1000 else a_expr
+            bits = (instruction >> 6) & 0x3F
+            if bits in ALU_EXPRESSIONS:
+                expression = ALU_EXPRESSIONS[bits].format(x="d", y=y)
+            else:
+                expression = f"alu[{bits}](d, {y})"
+            lines.append(f"    o = {expression}")
+
+            jump = instruction & 0b111
+            target = None
+            if jump:
+                target = str(known & ADDRESS_MASK) if known is not None else "t"
+                if known is None:
+                    lines.append("    t = a & 32767")
+
+            if instruction & 0b001000:
+                lines.append(f"    ram[{address}] = o")
+            if instruction & 0b010000:
+                lines.append("    d = o")
+            if instruction & 0b100000:
+                lines.append("    a = o")
+                known = None
+                a_expr = "a"
+
+            if jump or pc == 0:
+                # a block ending in `(L) @L 0;JMP` halts, also when execution
+                # fell into the loop, so it is counted once as by the interpreter
+                loop = (pc - 2) & ADDRESS_MASK
+                halts = (
+                    jump == 0b111
+                    and pc - start >= 2
+                    and rom[loop] == loop
+                    and target == str(loop)
+                    and not instruction & 0b111000
+                )
+                return self._finish(lines, start, pc, a_expr, jump and target, jump, halts)
+
+    def _finish(
+        self,
+        lines: List[str],
+        start: int,
+        pc: int,
+        a_expr: str,
+        target: Union[str, None],
+        jump: int = 0,
+        halts: bool = False,
+    ) -> Block:
+        if jump == 0b111:
+            lines.append(f"    return {target}, {a_expr}, d")
+        else:
+            if jump:
+                lines.append(f"    if {JUMP_CONDITIONS[jump]}:")
+                lines.append(f"        return {target}, {a_expr}, d")
+            lines.append(f"    return {pc}, {a_expr}, d")
+
+        namespace = {"alu": self.alu_functions}
+        exec(compile("\n".join(lines), f"<hack block {start}>", "exec"), namespace)
+        return Block(start, (pc - start) & ADDRESS_MASK or ADDRESS_MASK + 1, halts, namespace["block"])
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+from array import array
+from typing import List
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, the pure Python decoder is used instead
+    np = None
+
+# opcode classes
+A_INSTRUCTION = 0
+C_INSTRUCTION_A = 1  # y operand is A
+C_INSTRUCTION_M = 2  # y operand is M = RAM[A]
+
+# dest mask bits
+DEST_M = 0b001
+DEST_D = 0b010
+DEST_A = 0b100
+
+
+class DecodedRom:
+    """
+    ROM decoded into parallel lists, one entry per ROM address.
+
+    kinds  : opcode class (A_INSTRUCTION, C_INSTRUCTION_A, C_INSTRUCTION_M)
+    alus   : ALU control bits zx nx zy ny f no, an index into ALU_FUNCTIONS
+    dests  : dest mask (DEST_A | DEST_D | DEST_M)
+    jumps  : jump mask j1 j2 j3 (taken on negative / zero / positive)
+    values : A-instructions, the value loaded into A
+    """
+
+    __slots__ = ("kinds", "alus", "dests", "jumps", "values")
+
+    def __init__(
+        self, kinds: List[int], alus: List[int], dests: List[int], jumps: List[int], values: List[int]
+    ) -> None:
+        self.kinds = kinds
+        self.alus = alus
+        self.dests = dests
+        self.jumps = jumps
+        self.values = values
+
+
+def decode(rom: array) -> DecodedRom:
+    if np is not None:
+        return _decode_numpy(rom)
+    return _decode_python(rom)
+
+
+def _decode_numpy(rom: array) -> DecodedRom:
+    words = np.frombuffer(rom, dtype=np.uint16).astype(np.int32)
+    is_c = words >> 15
+    kinds = is_c * (1 + ((words >> 12) & 1))
+    alus = ((words >> 6) & 0x3F) * is_c
+    dests = (((words >> 5) & 1) << 2 | ((words >> 4) & 1) << 1 | (words >> 3) & 1) * is_c
+    jumps = (words & 0b111) * is_c
+    values = words * (1 - is_c)
+    return DecodedRom(
+        kinds.tolist(), alus.tolist(), dests.tolist(), jumps.tolist(), values.tolist()
+    )
+
+
+def _decode_python(rom: array) -> DecodedRom:
+    kinds = [
+        A_INSTRUCTION if word < 0x8000 else C_INSTRUCTION_M if word & 0x1000 else C_INSTRUCTION_A
+        for word in rom
+    ]
+    alus = [(word >> 6) & 0x3F if word >= 0x8000 else 0 for word in rom]
+    dests = [
+        ((word >> 5) & 1) << 2 | ((word >> 4) & 1) << 1 | (word >> 3) & 1 if word >= 0x8000 else 0
+        for word in rom
+    ]
+    jumps = [word & 0b111 if word >= 0x8000 else 0 for word in rom]
+    values = [word if word < 0x8000 else 0 for word in rom]
+    return DecodedRom(kinds, alus, dests, jumps, values)
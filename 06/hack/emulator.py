@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+
+from array import array
+from typing import Callable, Iterable, List, Union
+
+from assembler.image import load_rom
+from .blocks import BlockCache
+from .decode import A_INSTRUCTION, C_INSTRUCTION_M, DEST_A, DEST_D, DEST_M, decode
+
+ROM_SIZE = 32768
+RAM_SIZE = 32768
+ADDRESS_MASK = 0x7FFF
+WORD_MASK = 0xFFFF
+
+SCREEN = 16384
+KBD = 24576
+
+
+def alu(bits: int) -> Callable[[int, int], int]:
+    """
+    Builds the ALU function selected by the six control bits
+    zx nx zy ny f no (instruction[11..6]) as in 05/CPU.hdl.
+    """
+    zx, nx, zy, ny, f, no = [(bits >> shift) & 1 for shift in range(5, -1, -1)]
+
+    def compute(x: int, y: int) -> int:
+        if zx:
+            x = 0
+        if nx:
+            x = ~x & WORD_MASK
+        if zy:
+            y = 0
+        if ny:
+            y = ~y & WORD_MASK
+        out = (x + y) & WORD_MASK if f else x & y
+        if no:
+            out = ~out & WORD_MASK
+        return out
+
+    return compute
+
+
+# the documented comp functions get a direct implementation, every other bit
+# combination falls back to the generic gate-level model above.
+_ALU_FAST = {
+    0b101010: lambda x, y: 0,
+    0b111111: lambda x, y: 1,
+    0b111010: lambda x, y: WORD_MASK,
+    0b001100: lambda x, y: x,
+    0b110000: lambda x, y: y,
+    0b001101: lambda x, y: ~x & WORD_MASK,
+    0b110001: lambda x, y: ~y & WORD_MASK,
+    0b001111: lambda x, y: -x & WORD_MASK,
+    0b110011: lambda x, y: -y & WORD_MASK,
+    0b011111: lambda x, y: (x + 1) & WORD_MASK,
+    0b110111: lambda x, y: (y + 1) & WORD_MASK,
+    0b001110: lambda x, y: (x - 1) & WORD_MASK,
+    0b110010: lambda x, y: (y - 1) & WORD_MASK,
+    0b000010: lambda x, y: (x + y) & WORD_MASK,
+    0b010011: lambda x, y: (x - y) & WORD_MASK,
+    0b000111: lambda x, y: (y - x) & WORD_MASK,
+    0b000000: lambda x, y: x & y,
+    0b010101: lambda x, y: x | y,
+}
+
+ALU_FUNCTIONS: List[Callable[[int, int], int]] = [
+    _ALU_FAST.get(bits) or alu(bits) for bits in range(64)
+]
+
+
+def to_signed(value: int) -> int:
+    return value - 0x10000 if value & 0x8000 else value
+
+
+class Emulator:
+    """
+    Headless Hack computer: the CPU of 05/CPU.hdl with a 32K word ROM and RAM.
+
+    Registers and memory hold unsigned 16 bit values. `run()` executes up to
+    a cycle budget and stops early when the program reaches the usual
+    `(END) @END 0;JMP` halt loop. With `translate` (the default) it runs
+    translated basic blocks, otherwise the instruction by instruction loop.
+    """
+
+    def __init__(self, rom: Union[str, Iterable[int], None] = None, translate: bool = True) -> None:
+        self.translate = translate
+        self.ram = array("H", bytes(2 * RAM_SIZE))
+        self.a = 0
+        self.d = 0
+        if rom is not None:
+            self.load(rom)
+        else:
+            self._set_rom(array("H"))
+
+    def load(self, rom: Union[str, Iterable[int]]) -> None:
+        self._set_rom(load_rom(rom) if isinstance(rom, str) else array("H", rom))
+
+    def _set_rom(self, words: array) -> None:
+        # the ROM and everything derived from it: translated blocks, decoded tables
+        assert len(words) <= ROM_SIZE
+        self.rom = array("H", bytes(2 * ROM_SIZE))
+        self.rom[: len(words)] = words
+        self.rom_size = len(words)
+        self.blocks = BlockCache(self.rom, ALU_FUNCTIONS)
+        self.decoded = decode(self.rom)
+        self.reset()
+
+    def reset(self) -> None:
+        self.pc = 0
+        self.cycles = 0
+        self.halted = False
+
+    def peek(self, address: int) -> int:
+        return self.ram[address & ADDRESS_MASK]
+
+    def peek_signed(self, address: int) -> int:
+        return to_signed(self.peek(address))
+
+    def poke(self, address: int, value: int) -> None:
+        self.ram[address & ADDRESS_MASK] = value & WORD_MASK
+
+    def step(self) -> None:
+        self.run_interpreted(1)
+
+    def run(self, cycles: int, stop_at: Union[int, None] = None) -> int:
+        """
+        Runs up to `cycles` instructions. Stops early on the halt loop or,
+        with `stop_at`, when the pc reaches that ROM address.
+        """
+        if self.translate:
+            return self.run_translated(cycles, stop_at)
+        return self.run_interpreted(cycles, stop_at)
+
+    def run_translated(self, cycles: int, stop_at: Union[int, None] = None) -> int:
+        stop = -1 if stop_at is None else stop_at
+        self.halted = False
+        executed = 0
+        while executed < cycles and not self.halted and self.pc != stop:
+            executed += self._run_blocks(cycles - executed, stop)
+            if executed < cycles and not self.halted and self.pc != stop:
+                # the budget or the stop address ends inside the next block
+                block = self.blocks.get(self.pc)
+                executed += self.run_interpreted(min(block.length, cycles - executed), stop_at)
+        return executed
+
+    def _run_blocks(self, cycles: int, stop: int) -> int:
+        ram, blocks = self.ram, self.blocks
+        a, d, pc = self.a, self.d, self.pc
+        executed = 0
+        halted = False
+
+        while executed < cycles and pc != stop:
+            block = blocks.get(pc)
+            if executed + block.length > cycles or block.start < stop < block.start + block.length:
+                break
+            pc, a, d = block.function(ram, a, d)
+            executed += block.length
+            if block.halts:
+                halted = True
+                break
+
+        self.a, self.d, self.pc = a, d, pc
+        self.cycles += executed
+        self.halted = halted
+        return executed
+
+    def run_interpreted(self, cycles: int, stop_at: Union[int, None] = None) -> int:
+        decoded, ram, alu_functions = self.decoded, self.ram, ALU_FUNCTIONS
+        kinds, alus, dests, jumps, values = (
+            decoded.kinds, decoded.alus, decoded.dests, decoded.jumps, decoded.values
+        )
+        a, d, pc = self.a, self.d, self.pc
+        stop = -1 if stop_at is None else stop_at
+        executed = 0
+        halted = False
+
+        while executed < cycles and pc != stop:
+            executed += 1
+            kind = kinds[pc]
+            if kind == A_INSTRUCTION:
+                a = values[pc]
+                pc = (pc + 1) & ADDRESS_MASK
+                continue
+
+            y = ram[a & ADDRESS_MASK] if kind == C_INSTRUCTION_M else a
+            out = alu_functions[alus[pc]](d, y)
+            dest = dests[pc]
+
+            # jump bits j1 j2 j3 are taken on negative, zero and positive
+            jump = jumps[pc]
+            if jump and jump & (0b010 if out == 0 else 0b100 if out & 0x8000 else 0b001):
+                target = a & ADDRESS_MASK
+                # only an unconditional `(L) @L 0;JMP` without dest is a halt
+                if (
+                    jump == 0b111
+                    and not dest
+                    and target == pc - 1
+                    and kinds[target] == A_INSTRUCTION
+                    and values[target] == target
+                ):
+                    halted = True
+                pc = target
+            else:
+                pc = (pc + 1) & ADDRESS_MASK
+
+            if dest:
+                if dest & DEST_M:
+                    ram[a & ADDRESS_MASK] = out
+                if dest & DEST_D:
+                    d = out
+                if dest & DEST_A:
+                    a = out
+
+            if halted:
+                break
+
+        self.a, self.d, self.pc = a, d, pc
+        self.cycles += executed
+        self.halted = halted
+        return executed
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+
+import os, sys
+sys.path.append(os.getcwd())
+
+from timeit import timeit
+from typing import Callable, List, Tuple
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..")
+sys.path.append(os.path.join(ROOT_DIR, "06"))
+DEFAULT_VM_DIR = os.path.join(ROOT_DIR, "12", "examples", "Pong")
+OS_VM_DIR = os.path.join(ROOT_DIR, "12", "OS")
+# operands for check_folds(), including differences that overflow 16 bits
+FOLD_OPERANDS = [0, 1, -1, 2, 100, -100, 16384, -16384, 32767, -32767, -32768]
+
+from vm2hack import CodeWriter, Parser
+from vm2hack.optimizer import BINARY_FOLDS, UNARY_FOLDS, VMOptimizer
+from vm2hack.parser import Command
+from vm2hack.translator import write_command
+
+
+class OriginalParser:
+    """
+    The parser before commands were tokenized once, kept here as the
+    baseline: commandType() scans the enum on every call and advance()
+    recurses over blank lines.
+    """
+
+    def __init__(self, vm_file: str) -> None:
+        with open(vm_file) as f:
+            self.lines = f.readlines()
+        self.line = None
+        self.parts = []
+        self.line_index = 0
+
+    def hasMoreCommands(self) -> bool:
+        return self.line_index < len(self.lines)
+
+    def advance(self) -> None:
+        self.line = self.lines[self.line_index].split("//")[0].strip()
+        self.line_index += 1
+        while len(self.line) == 0:
+            if not self.hasMoreCommands():
+                break
+            self.advance()
+        if len(self.line) != 0:
+            self.parts = self.line.split(" ")
+
+    def commandType(self) -> Parser.CommandType:
+        for ctype in Parser.CommandType:
+            if self.parts[0] in ctype.value:
+                return ctype
+        return None
+
+    def arg1(self) -> str:
+        assert not self.commandType() == Parser.CommandType.C_RETURN
+        if self.commandType() == Parser.CommandType.C_ARITHMETIC:
+            return self.parts[0]
+        return self.parts[1]
+
+    def arg2(self) -> int:
+        assert self.commandType() in [
+            Parser.CommandType.C_PUSH,
+            Parser.CommandType.C_POP,
+            Parser.CommandType.C_FUNCTION,
+            Parser.CommandType.C_CALL,
+        ]
+        return self.parts[2]
+
+
+def vm_files_of(vm_dir: str) -> List[str]:
+    return sorted(os.path.join(vm_dir, file) for file in os.listdir(vm_dir) if file.endswith(".vm"))
+
+
+def parse_all(parser_class: type, vm_files: List[str]) -> List[Tuple]:
+    """Parses every file and queries each command the way translate() used to."""
+    commands = []
+    with_arg2 = [
+        Parser.CommandType.C_PUSH,
+        Parser.CommandType.C_POP,
+        Parser.CommandType.C_FUNCTION,
+        Parser.CommandType.C_CALL,
+    ]
+    for vm_file in vm_files:
+        parser = parser_class(vm_file)
+        while parser.hasMoreCommands():
+            parser.advance()
+            command_type = parser.commandType()
+            if command_type == Parser.CommandType.C_RETURN:
+                commands.append((command_type,))
+            elif command_type in with_arg2:
+                commands.append((command_type, parser.arg1(), int(parser.arg2())))
+            else:
+                commands.append((command_type, parser.arg1()))
+    return commands
+
+
+def read_all(vm_files: List[str]) -> List[Command]:
+    """Parses every file and takes the command records, as translate() does."""
+    commands = []
+    for vm_file in vm_files:
+        commands += Parser(vm_file).commands
+    return commands
+
+
+def bench_parser(vm_dir: str, repeat: int = 5) -> None:
+    vm_files = vm_files_of(vm_dir)
+    expected = parse_all(Parser, vm_files)
+    assert parse_all(OriginalParser, vm_files) == expected
+    assert len(read_all(vm_files)) == len(expected)
+
+    lines = sum(len(open(vm_file).readlines()) for vm_file in vm_files)
+    print(f"{vm_dir}: {len(vm_files)} files, {lines} lines, {len(expected)} commands")
+    runs: List[Tuple[str, Callable[[], list]]] = [
+        ("OriginalParser", lambda: parse_all(OriginalParser, vm_files)),
+        ("Parser", lambda: parse_all(Parser, vm_files)),
+        ("Parser.commands", lambda: read_all(vm_files)),
+    ]
+    for name, run in runs:
+        seconds = timeit(run, number=repeat) / repeat
+        print(f"  {name:<16} {len(expected) / seconds / 1e3:8.1f} K commands/s  ({seconds * 1e3:.1f} ms)")
+
+
+def loop_function_entry(funcName: str, numLocals: int) -> List[str]:
+    """writeFunction before it was specialized: a counting loop for any numLocals."""
+    return [
+        f"({funcName})",
+        f"@{numLocals}",
+        "D=A",
+        "(INITLCLS)",
+        "@FINLCLS",
+        "D;JEQ",
+        "@SP",
+        "A=M",
+        "M=0",
+        "@SP",
+        "M=M+1",
+        "D=D-1",
+        "@INITLCLS",
+        "D;JNE",
+        "(FINLCLS)",
+    ]
+
+
+def function_entry(funcName: str, numLocals: int) -> List[str]:
+    code_writer = CodeWriter(os.devnull)
+    code_writer.writeFunction(funcName, numLocals)
+    return code_writer.takeLines()
+
+
+def entry_cost(lines: List[str], numLocals: int) -> Tuple[int, int]:
+    """
+    Runs a function entry on the emulator with garbage on the stack and
+    returns its instructions and cycles, checking that it pushed zeros.
+    """
+    from assembler.stream import StreamingAssembler
+    from hack import Emulator
+
+    asm = StreamingAssembler()
+    asm.feed_lines([*lines, "(END)", "@END", "0;JMP"])
+    words = asm.finish()
+    end = asm.symbol_table.getAddress("END")
+    emulator = Emulator(words)
+    emulator.poke(0, 256)
+    for address in range(256, 256 + numLocals + 1):
+        emulator.poke(address, 0x5555)
+    emulator.run(100000, end)
+    assert emulator.peek(0) == 256 + numLocals
+    assert all(emulator.peek(address) == 0 for address in range(256, 256 + numLocals))
+    assert emulator.peek(256 + numLocals) == 0x5555
+    return end, emulator.cycles
+
+
+def bench_function_entry(vm_dir: str) -> None:
+    functions = [
+        (command.args[0], command.args[1])
+        for vm_file in vm_files_of(vm_dir)
+        for command in Parser(vm_file).commands
+        if command.kind == "function"
+    ]
+    print(f"{vm_dir}: {len(functions)} functions, entry instructions / cycles")
+    print(f"  {'function':<24} {'locals':>6} {'loop':>12} {'specialized':>12}")
+    totals = [0, 0, 0, 0]
+    for name, locals_count in functions:
+        loop_size, loop_cycles = entry_cost(loop_function_entry(name, locals_count), locals_count)
+        size, cycles = entry_cost(function_entry(name, locals_count), locals_count)
+        totals = [a + b for a, b in zip(totals, [loop_size, loop_cycles, size, cycles])]
+        print(f"  {name:<24} {locals_count:>6} {loop_size:>5} / {loop_cycles:<4} {size:>5} / {cycles:<4}")
+    loop_size, loop_cycles, size, cycles = totals
+    print(f"  {'total':<24} {'':>6} {loop_size:>5} / {loop_cycles:<4} {size:>5} / {cycles:<4}")
+    print(f"  instructions {loop_size} -> {size}, cycles for one call of each {loop_cycles} -> {cycles}")
+
+
+def run_commands(commands: List[Command]) -> int:
+    """Translates and runs `commands` on the emulator, returns the stack top."""
+    from assembler.stream import StreamingAssembler
+    from hack import Emulator
+
+    code_writer = CodeWriter(os.devnull)
+    for command in commands:
+        write_command(code_writer, command)
+    asm = StreamingAssembler()
+    asm.feed_lines([*code_writer.takeLines(), "(END)", "@END", "0;JMP"])
+    emulator = Emulator(asm.finish())
+    emulator.poke(0, 256)
+    emulator.run(100000)
+    assert emulator.halted
+    return emulator.peek_signed(emulator.peek(0) - 1)
+
+
+def check_folds() -> None:
+    """Checks the optimizer folds constants to what the generated code computes."""
+    checked = 0
+    for kind in [*BINARY_FOLDS, *UNARY_FOLDS]:
+        pairs = (
+            [(x, y) for x in FOLD_OPERANDS for y in FOLD_OPERANDS]
+            if kind in BINARY_FOLDS
+            else [(x,) for x in FOLD_OPERANDS]
+        )
+        for operands in pairs:
+            commands = [*(Command("push", "constant", x) for x in operands), Command(kind)]
+            folded = VMOptimizer().optimize(commands)
+            assert len(folded) == 1, (kind, operands, folded)
+            assert run_commands(folded) == run_commands(commands), (kind, operands)
+            checked += 1
+    print(f"  {checked} folds agree with the generated code")
+
+
+if __name__ == "__main__":
+    arguments = sys.argv[1:]
+    command = arguments[0] if len(arguments) > 0 else "all"
+    if command in ("parse", "all"):
+        bench_parser(arguments[1] if len(arguments) > 1 and command == "parse" else DEFAULT_VM_DIR)
+    if command in ("fold", "all"):
+        check_folds()
+    if command in ("entry", "all"):
+        bench_function_entry(arguments[1] if len(arguments) > 1 and command == "entry" else OS_VM_DIR)
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+import os, sys
+import tempfile
+sys.path.append(os.getcwd())
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..")
+sys.path.append(os.path.join(ROOT_DIR, "06"))
+
+from typing import Dict, List, Union
+from vm2hack import translate
+from assembler.parser import CommandType, parse_lines
+from assembler.stream import StreamingAssembler
+from hack import Emulator
+
+DEFAULT_EXAMPLES_DIR = os.path.join(ROOT_DIR, "12", "examples")
+DEFAULT_MAX_CYCLES = 20000000
+ROM_SIZE = 32768
+
+CONFIGURATIONS: Dict[str, dict] = {
+    "baseline": {},
+    "shared-calls": {"shared_calls": True},
+    "shared-compare": {"shared_calls": True, "shared_compare": True},
+    "peephole": {"shared_calls": True, "shared_compare": True, "peephole": True},
+    "optimize": {"shared_calls": True, "shared_compare": True, "peephole": True, "optimize": True},
+    "cache-top": {
+        "shared_calls": True,
+        "shared_compare": True,
+        "peephole": True,
+        "optimize": True,
+        "cache_top": True,
+    },
+    "eliminate-dead": {
+        "shared_calls": True,
+        "shared_compare": True,
+        "peephole": True,
+        "optimize": True,
+        "cache_top": True,
+        "eliminate_dead": True,
+    },
+    "inline": {
+        "shared_calls": True,
+        "shared_compare": True,
+        "peephole": True,
+        "optimize": True,
+        "cache_top": True,
+        "eliminate_dead": True,
+        "inline": True,
+    },
+}
+
+
+def program_dirs(examples_dir: str) -> List[str]:
+    return [
+        os.path.join(examples_dir, name)
+        for name in sorted(os.listdir(examples_dir))
+        if os.path.isdir(os.path.join(examples_dir, name))
+        and any(file.endswith(".vm") for file in os.listdir(os.path.join(examples_dir, name)))
+    ]
+
+
+def vm_files_of(program_dir: str) -> List[str]:
+    return sorted(
+        os.path.join(program_dir, file) for file in os.listdir(program_dir) if file.endswith(".vm")
+    )
+
+
+def build(program_dir: str, options: dict) -> List[str]:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        asm_file = os.path.join(tmp_dir, os.path.basename(program_dir) + ".asm")
+        translate(vm_files_of(program_dir), asm_file, **options)
+        with open(asm_file) as f:
+            return f.readlines()
+
+
+def rom_words(asm_lines: List[str]) -> int:
+    # counted rather than assembled, oversized programs have label
+    # addresses that do not fit into a word
+    return sum(
+        1 for instruction in parse_lines(asm_lines) if instruction.kind != CommandType.L_COMMAND
+    )
+
+
+def expected_ram(program_dir: str) -> Dict[int, int]:
+    """Reads the RAM values a program's .cmp file expects, if it has one."""
+    for file in os.listdir(program_dir):
+        if file.endswith(".cmp"):
+            with open(os.path.join(program_dir, file)) as f:
+                rows = [line.strip().strip("|").split("|") for line in f if line.startswith("|")]
+            addresses = [int(cell.strip()[4:-1]) for cell in rows[0]]
+            return dict(zip(addresses, (int(cell) for cell in rows[1])))
+    return dict()
+
+
+def run_program(asm_lines: List[str], max_cycles: int) -> Union[Emulator, None]:
+    """Runs a program until it calls Sys.halt, None if it does not fit into ROM."""
+    if rom_words(asm_lines) > ROM_SIZE:
+        return None
+    asm = StreamingAssembler()
+    asm.feed_lines(asm_lines)
+    emulator = Emulator(asm.finish())
+    emulator.run(max_cycles, asm.symbol_table.table.get("Sys.halt"))
+    return emulator
+
+
+def describe_run(emulator: Union[Emulator, None], expected: Dict[int, int], max_cycles: int) -> str:
+    if emulator is None:
+        return "no fit"
+    if emulator.cycles >= max_cycles:
+        return f">{max_cycles}"
+    if any(emulator.peek_signed(address) != value for address, value in expected.items()):
+        return f"{emulator.cycles} FAIL"
+    return f"{emulator.cycles}{' ok' if expected else ''}"
+
+
+def report(
+    examples_dir: str, configurations: Dict[str, dict], max_cycles: Union[int, None] = DEFAULT_MAX_CYCLES
+) -> None:
+    """
+    Prints ROM words per program and configuration, and with `max_cycles`
+    the cycles each program takes to reach Sys.halt in the emulator.
+    Programs with a .cmp file are checked against its RAM values.
+    """
+    names = list(configurations)
+    header = f"  {'program':<14}" + "".join(f"{name:>18}" for name in names)
+    sizes: Dict[str, List[int]] = dict()
+    runs: Dict[str, List[str]] = dict()
+    for program_dir in program_dirs(examples_dir):
+        program = os.path.basename(program_dir)
+        expected = expected_ram(program_dir)
+        sizes[program], runs[program] = [], []
+        for name in names:
+            asm_lines = build(program_dir, configurations[name])
+            sizes[program].append(rom_words(asm_lines))
+            if max_cycles is not None:
+                emulator = run_program(asm_lines, max_cycles)
+                runs[program].append(describe_run(emulator, expected, max_cycles))
+
+    print(f"ROM words per program ({ROM_SIZE} fit in ROM)")
+    print(header)
+    for program, program_sizes in sizes.items():
+        cells = [f"{program_sizes[0]:>18}"] + [
+            f"{size:>10} ({(size - program_sizes[0]) * 100 / program_sizes[0]:+4.0f}%)"
+            for size in program_sizes[1:]
+        ]
+        print(f"  {program:<14}" + "".join(cells))
+
+    if max_cycles is not None:
+        print("cycles to Sys.halt")
+        print(header)
+        for program, program_runs in runs.items():
+            print(f"  {program:<14}" + "".join(f"{run:>18}" for run in program_runs))
+
+
+if __name__ == "__main__":
+    arguments = sys.argv[1:]
+    max_cycles = DEFAULT_MAX_CYCLES
+    for argument in arguments:
+        if argument.startswith("--cycles="):
+            max_cycles = int(argument.removeprefix("--cycles="))
+        elif argument == "--no-run":
+            max_cycles = None
+    arguments = [argument for argument in arguments if not argument.startswith("--")]
+    report(arguments[0] if len(arguments) > 0 else DEFAULT_EXAMPLES_DIR, CONFIGURATIONS, max_cycles)
@@ -4,43 +4,44 @@
 import os, sys
 sys.path.append(os.getcwd())
 
+ROOT_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..")
+# the assembler of 06, for --binary
+sys.path.append(os.path.join(ROOT_DIR, "06"))
+
 from typing import List
-from vm2hack import Parser, CodeWriter
-
-def translate(vm_files: List[str], asm_file: str) -> None:
-    parsers = list(map(lambda vm_file: Parser(vm_file), vm_files))
-    code_writer = CodeWriter(asm_file)
-
-    code_writer.writeInit()
-    for parser in parsers:
-        code_writer.setVmFile(parser.getVmFile())
-        while(parser.hasMoreCommands()):
-            parser.advance()
-            print(f"idx: {parser.line_index:05d} line: '{parser.line}'")
-            if parser.commandType() == Parser.CommandType.C_ARITHMETIC:
-                code_writer.writeArithmetic(parser.arg1())
-            elif parser.commandType() == Parser.CommandType.C_PUSH:
-                code_writer.writePushPop("push", parser.arg1(), parser.arg2())
-            elif parser.commandType() == Parser.CommandType.C_POP:
-                code_writer.writePushPop("pop", parser.arg1(), parser.arg2())
-            elif parser.commandType() == Parser.CommandType.C_LABEL:
-                code_writer.writeLabel(parser.arg1())
-            elif parser.commandType() == Parser.CommandType.C_GOTO:
-                code_writer.writeGoto(parser.arg1())
-            elif parser.commandType() == Parser.CommandType.C_IF:
-                code_writer.writeIf(parser.arg1())
-            elif parser.commandType() == Parser.CommandType.C_CALL:
-                code_writer.writeCall(parser.arg1(), parser.arg2())
-            elif parser.commandType() == Parser.CommandType.C_RETURN:
-                code_writer.writeReturn()
-            elif parser.commandType() == Parser.CommandType.C_FUNCTION:
-                code_writer.writeFunction(parser.arg1(), parser.arg2())
-            
-    code_writer.close()
+from vm2hack import translate
+from vm2hack.translator import NORMAL, QUIET, VERBOSE
+
+
+def parse_options(arguments: List[str]) -> dict:
+    jobs = 1
+    cache_dir = None  # "" selects the default cache directory
+    for argument in arguments:
+        if argument.startswith("--jobs="):
+            jobs = int(argument.removeprefix("--jobs=")) or None
+        elif argument == "--cache" or argument.startswith("--cache="):
+            cache_dir = argument.removeprefix("--cache").removeprefix("=")
+    return {
+        "shared_calls": "--shared-calls" in arguments,
+        "shared_compare": "--shared-compare" in arguments,
+        "peephole": "--peephole" in arguments,
+        "optimize": "-O" in arguments,
+        "cache_top": "--cache-top" in arguments,
+        "eliminate_dead": "--eliminate-dead" in arguments,
+        "inline": "--inline" in arguments,
+        "binary": "--binary" in arguments,
+        "keep_asm": "--asm" in arguments,
+        "source_map": "--source-map" in arguments,
+        "jobs": jobs,
+        "cache_dir": cache_dir,
+        "verbosity": VERBOSE if "-v" in arguments else QUIET if "-q" in arguments else NORMAL,
+    }
 
 
 def main():
     arguments = sys.argv[1:]
+    options = parse_options(arguments)
+    arguments = [argument for argument in arguments if not argument.startswith("-")]
     if len(arguments) < 1:
         print("no path in argument")
         sys.exit(1)
@@ -56,7 +57,8 @@ def main():
     asm_file = None
 
     if os.path.isdir(path):
-        for file in os.listdir(path):
+        # sorted, so the link order and the ROM layout do not depend on the filesystem
+        for file in sorted(os.listdir(path)):
             if file.endswith(".vm"):
                 vm_files.append(os.path.join(path, file))
         asm_file = os.path.join(path, os.path.basename(path) + ".asm")
@@ -68,14 +70,49 @@ def main():
         print(f"no vm files in: {path}")
         raise IOError()
 
-    print("vm files to translate: ")
-    for vm_file in vm_files:
-        print(f"  {vm_file}")
-
-    print("asm out file: ")
-    print(f"  {asm_file}")
-
-    translate(vm_files, asm_file)
+    verbose = options["verbosity"] >= NORMAL
+    if verbose:
+        print("vm files to translate: ")
+        for vm_file in vm_files:
+            print(f"  {vm_file}")
+
+        if not options["binary"] or options["keep_asm"]:
+            print("asm out file: ")
+            print(f"  {asm_file}")
+        if options["binary"]:
+            print("rom out file: ")
+            print(f"  {asm_file.removesuffix('.asm')}.rom")
+        if options["source_map"]:
+            print("map out file: ")
+            print(f"  {asm_file.removesuffix('.asm')}.map")
+
+    code_writer = translate(vm_files, asm_file, **options)
+    if not verbose:
+        return
+
+    print("timings: ")
+    for phase, seconds in code_writer.timings.items():
+        print(f"  {phase:<8} {seconds * 1e3:8.1f} ms")
+
+    if code_writer.cache is not None:
+        print("object cache:")
+        print(code_writer.cache.report())
+
+    if code_writer.inliner is not None:
+        print("inlined functions:")
+        print("\n".join(code_writer.inliner.report()))
+
+    if code_writer.eliminator is not None:
+        print("dead functions:")
+        print("\n".join(code_writer.eliminator.report()))
+
+    if code_writer.vm_optimizer is not None:
+        print("-O:")
+        print("\n".join(code_writer.vm_optimizer.report()))
+
+    if code_writer.optimizer is not None:
+        print("peephole:")
+        print("\n".join(code_writer.optimizer.report()))
 
 
 if __name__ == "__main__":
@@ -2,3 +2,4 @@
 
 from .parser import Parser
 from .code_writer import CodeWriter
+from .translator import translate
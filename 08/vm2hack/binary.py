@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+from array import array
+from typing import List, Tuple
+
+# needs the assembler of 06 on sys.path, see vm2hack.py
+from assembler.code import C_INSTRUCTION_CODES
+from assembler.stream import StreamingAssembler
+from assembler.symbol_table import PREDEFINED_SYMBOLS
+
+
+class HackObject:
+    """
+    The lines of one unit (a VM file, the bootstrap, the shared routines)
+    encoded on their own. A-instructions with a symbol are left 0 in
+    `words`, `symbols` lists them and the labels defined, in line order,
+    as (offset, symbol, is_label). HackEncoder.link() relocates and
+    resolves them.
+    """
+
+    def __init__(self, words: array, symbols: List[Tuple[int, str, bool]]) -> None:
+        self.words = words
+        self.symbols = symbols
+
+    @classmethod
+    def encode(cls, lines: List[str]) -> "HackObject":
+        words = array("H")
+        symbols = []
+        for line in lines:
+            first = line[0]
+            if first == "@":
+                symbol = line[1:]
+                if symbol.isdigit():
+                    words.append(int(symbol))
+                else:
+                    symbols.append((len(words), symbol, False))
+                    words.append(0)
+            elif first == "(":
+                symbols.append((len(words), line[1:-1], True))
+            else:
+                words.append(C_INSTRUCTION_CODES[line])
+        return cls(words, symbols)
+
+
+class HackEncoder(StreamingAssembler):
+    """
+    Links the HackObjects of a program into ROM words.
+
+    Nothing is parsed: the code writer only emits `@value`, `(label)` and
+    C-instructions in canonical form, without comments or blanks, so
+    HackObject.encode() tells a line's kind by its first character and
+    encodes a C-instruction with a single lookup in C_INSTRUCTION_CODES.
+    link() appends the units in order and resolves their symbols the way
+    StreamingAssembler does, and finish() fixes up the variables, so the
+    words equal assembling the text.
+    """
+
+    def link(self, hack_object: HackObject) -> None:
+        """
+        Appends an encoded unit, as if StreamingAssembler.feed() got its
+        lines: only its symbols are visited, in the same order, so the words
+        and the symbol table come out the same.
+        """
+        base = len(self.words)
+        words = self.words
+        words.extend(hack_object.words)
+        table = self.symbol_table.table
+        for offset, symbol, is_label in hack_object.symbols:
+            if is_label:
+                self.symbol_table.addEntry(symbol, base + offset)
+            elif symbol in table:
+                words[base + offset] = table[symbol]
+            elif symbol in PREDEFINED_SYMBOLS:
+                self.symbol_table.addEntry(symbol)
+                words[base + offset] = table[symbol]
+            else:
+                self.fixups.setdefault(symbol, []).append(base + offset)
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import os
+from array import array
+from typing import Union
+
+# the assembler of 06, see vm2hack.py
+from assembler.cache import DEFAULT_MAX_BYTES, DirectoryCache
+from .binary import HackObject
+from .code_writer import CodeWriter
+from .source_map import SourceLine, origin_of
+
+# bump whenever the generated code or the object layout changes, so stale
+# objects of an older translator are never served.
+TRANSLATOR_VERSION = 5
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "vm2hack")
+
+
+class ObjectCache(DirectoryCache):
+    """
+    On-disk cache of translated VM files.
+
+    An object is what translate_file() produces for one file: its optimized
+    lines, the shared routines they jump to, the optimizer counts, and with
+    binary its HackObject. Lines only refer to labels and statics by name,
+    so an object links anywhere in a program. Entries are `.obj` files named
+    after the hash of the VM source, its file name (statics and labels are
+    named after it) and the options.
+    """
+
+    suffix = ".obj"
+
+    def __init__(self, directory: Union[str, None] = None, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        super().__init__(directory or os.environ.get("VM2HACK_CACHE", DEFAULT_CACHE_DIR), max_bytes)
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, vm_file: str, source: bytes, options: dict, extra: str = "") -> str:
+        digest = hashlib.sha256(f"vm2hack-{TRANSLATOR_VERSION}\0".encode())
+        digest.update(os.path.basename(vm_file).encode() + b"\0")
+        digest.update(json.dumps(options, sort_keys=True).encode() + b"\0")
+        digest.update(extra.encode() + b"\0")
+        digest.update(source)
+        return digest.hexdigest()
+
+    def get(self, key: str, asm_file: str, options: dict) -> Union[CodeWriter, None]:
+        data = self.load(key, _read_bytes)
+        if data is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return _load_unit(data, asm_file, options)
+
+    def put(self, key: str, unit: CodeWriter) -> None:
+        data = _dump_unit(unit)
+        self.store(key, lambda path: _write_bytes(path, data))
+
+    def report(self) -> str:
+        return f"  {self.hits} hits, {self.misses} misses"
+
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _write_bytes(path: str, data: bytes) -> None:
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def _dump_unit(unit: CodeWriter) -> bytes:
+    """
+    A JSON header line with the small fields and the sizes of the sections
+    that follow it raw: lines, and with binary words, symbol offsets,
+    symbols and label flags. Raw sections read far faster than JSON lists.
+    """
+    header = {
+        "origins": [
+            [i, *origin] for i, origin in enumerate(map(origin_of, unit.output)) if origin is not None
+        ],
+        "trampolines": sorted(unit.used_trampolines),
+    }
+    if unit.vm_optimizer is not None:
+        header["vm_optimizer"] = [unit.vm_optimizer.hits, unit.vm_optimizer.commands_in, unit.vm_optimizer.commands_out]
+    if unit.optimizer is not None:
+        header["optimizer"] = [unit.optimizer.hits, unit.optimizer.lines_in, unit.optimizer.lines_out]
+    sections = ["\n".join(unit.output).encode()]
+    if unit.hack_object is not None:
+        symbols = unit.hack_object.symbols
+        sections += [
+            unit.hack_object.words.tobytes(),
+            array("H", [offset for offset, _, _ in symbols]).tobytes(),
+            "\n".join(symbol for _, symbol, _ in symbols).encode(),
+            bytes(is_label for _, _, is_label in symbols),
+        ]
+    header["sections"] = [len(section) for section in sections]
+    return json.dumps(header, separators=(",", ":")).encode() + b"\n" + b"".join(sections)
+
+
+def _load_unit(data: bytes, asm_file: str, options: dict) -> CodeWriter:
+    end = data.index(b"\n")
+    header = json.loads(data[:end])
+    sections = []
+    offset = end + 1
+    for size in header["sections"]:
+        sections.append(data[offset : offset + size])
+        offset += size
+
+    unit = CodeWriter(asm_file, **options)
+    unit.output = sections[0].decode().split("\n") if sections[0] else []
+    if header["origins"]:
+        for i, *origin in header["origins"]:
+            unit.output[i] = SourceLine(unit.output[i], tuple(origin))
+    unit.used_trampolines = set(header["trampolines"])
+    if unit.vm_optimizer is not None:
+        unit.vm_optimizer.hits, unit.vm_optimizer.commands_in, unit.vm_optimizer.commands_out = header["vm_optimizer"]
+    if unit.optimizer is not None:
+        unit.optimizer.hits, unit.optimizer.lines_in, unit.optimizer.lines_out = header["optimizer"]
+    if len(sections) > 1:
+        words_data, offsets_data, symbols_data, labels = sections[1:]
+        words = array("H", words_data)
+        offsets = array("H", offsets_data)
+        symbols = symbols_data.decode().split("\n") if symbols_data else []
+        unit.hack_object = HackObject(words, list(zip(offsets, symbols, map(bool, labels))))
+    return unit
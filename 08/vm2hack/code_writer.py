@@ -1,8 +1,64 @@
 # -*- coding: utf-8 -*-
 
 import os
-from . import Parser
-from typing import List
+from time import perf_counter
+# the encoder and the image writer need the assembler of 06 on sys.path,
+# see vm2hack.py
+from assembler.image import write_image
+from .binary import HackEncoder, HackObject
+from .dead_code import DeadFunctionEliminator
+from .inliner import Inliner
+from .optimizer import VMOptimizer
+from .peephole import PeepholeOptimizer
+from .source_map import SourceLine, SourceMapWriter, origin_of
+from typing import Dict, List, Set, Union
+
+
+def _load_constant(value: int) -> List[str]:
+    # D = value for any 16-bit signed value, A-instructions only load 0..32767
+    if value >= 0:
+        return [f"@{value}", "D=A"]
+    elif value == -32768:
+        return ["@32767", "D=!A"]
+    return [f"@{-value}", "D=-A"]
+
+
+# segments addressed through a base pointer, and the fixed ones
+SEGMENT_POINTERS = {"local": "LCL", "argument": "ARG", "this": "THIS", "that": "THAT"}
+TEMP_BASE = 5
+POINTER_ADDRESSES = ["THIS", "THAT"]
+# up to this index, `@base A=M+1 A=A+1 ...` addresses a segment entry in
+# fewer instructions than `@base D=M @index A=D+A`, and leaves D alone
+ADDRESS_STEP_LIMIT = 2
+# below this index a pop steps A up from the base, beyond it the address
+# and the value are summed in D and taken apart again (9 instructions)
+POP_STEP_LIMIT = 4
+
+PUSH_D = ["@SP", "A=M", "M=D", "@SP", "M=M+1"]
+POP_D = ["@SP", "AM=M-1", "D=M"]
+
+
+def _step_address(base: str, index: int) -> List[str]:
+    # A = RAM[base] + index, one instruction per index beyond 1
+    return [f"@{base}", "A=M" if index == 0 else "A=M+1", *["A=A+1"] * (index - 1)]
+
+
+def _segment_address(base: str, index: int) -> List[str]:
+    # A = RAM[base] + index, in the fewest instructions
+    if index <= ADDRESS_STEP_LIMIT:
+        return _step_address(base, index)
+    return [f"@{base}", "D=M", f"@{index}", "A=D+A"]
+
+
+def _push_segment(base: str, index: int) -> List[str]:
+    return [*_segment_address(base, index), "D=M", *PUSH_D]
+
+
+def _pop_segment(base: str, index: int) -> List[str]:
+    if index < POP_STEP_LIMIT:
+        return [*POP_D, *_step_address(base, index), "M=D"]
+    # D = address + value, so D - value is the address and D - address the value
+    return [f"@{base}", "D=M", f"@{index}", "D=D+A", "@SP", "AM=M-1", "D=D+M", "A=D-M", "M=D-A"]
 
 
 ARITHMETIC_ASSEMBLY_CODES = {
@@ -94,200 +150,26 @@ ARITHMETIC_ASSEMBLY_CODES = {
 
 PUSHPOP_ASSEMBLY_CODES = {
     "push_constant": lambda index: [
-        f"@{index}",
-        "D=A",
-        "@SP",
-        "A=M",
-        "M=D",
-        "@SP",
-        "M=M+1",
-    ],
-    "push_local": lambda index: [
-        "@LCL",
-        "D=M",
-        f"@{index}",
-        "D=D+A",
-        "A=D",
-        "D=M",
-        "@SP",
-        "A=M",
-        "M=D",
-        "@SP",
-        "M=M+1",
-    ],
-    "pop_local": lambda index: [
-        "@SP",
-        "AM=M-1",
-        "D=M",
-        "@R13",
-        "M=D",
-        "@LCL",
-        "D=M",
-        f"@{index}",
-        "D=D+A",
-        "@R14",
-        "M=D",
-        "@R13",
-        "D=M",
-        "@R14",
-        "A=M",
-        "M=D",
-    ],
-    "push_argument": lambda index: [
-        "@ARG",
-        "D=M",
-        f"@{index}",
-        "D=D+A",
-        "A=D",
-        "D=M",
+        *_load_constant(int(index)),
         "@SP",
         "A=M",
         "M=D",
         "@SP",
         "M=M+1",
     ],
-    "pop_argument": lambda index: [
-        "@SP",
-        "AM=M-1",
-        "D=M",
-        "@R13",
-        "M=D",
-        "@ARG",
-        "D=M",
-        f"@{index}",
-        "D=D+A",
-        "@R14",
-        "M=D",
-        "@R13",
-        "D=M",
-        "@R14",
-        "A=M",
-        "M=D",
-    ],
-    "push_this": lambda index: [
-        "@THIS",
-        "D=M",
-        f"@{index}",
-        "D=D+A",
-        "A=D",
-        "D=M",
-        "@SP",
-        "A=M",
-        "M=D",
-        "@SP",
-        "M=M+1",
-    ],
-    "pop_this": lambda index: [
-        "@SP",
-        "AM=M-1",
-        "D=M",
-        "@R13",
-        "M=D",
-        "@THIS",
-        "D=M",
-        f"@{index}",
-        "D=D+A",
-        "@R14",
-        "M=D",
-        "@R13",
-        "D=M",
-        "@R14",
-        "A=M",
-        "M=D",
-    ],
-    "push_that": lambda index: [
-        "@THAT",
-        "D=M",
-        f"@{index}",
-        "D=D+A",
-        "A=D",
-        "D=M",
-        "@SP",
-        "A=M",
-        "M=D",
-        "@SP",
-        "M=M+1",
-    ],
-    "pop_that": lambda index: [
-        "@SP",
-        "AM=M-1",
-        "D=M",
-        "@R13",
-        "M=D",
-        "@THAT",
-        "D=M",
-        f"@{index}",
-        "D=D+A",
-        "@R14",
-        "M=D",
-        "@R13",
-        "D=M",
-        "@R14",
-        "A=M",
-        "M=D",
-    ],
-    "push_temp": lambda index: [
-        "@R5",
-        "D=A",
-        f"@{index}",
-        "D=D+A",
-        "A=D",
-        "D=M",
-        "@SP",
-        "A=M",
-        "M=D",
-        "@SP",
-        "M=M+1",
-    ],
-    "pop_temp": lambda index: [
-        "@SP",
-        "AM=M-1",
-        "D=M",
-        "@R13",
-        "M=D",
-        "@R5",
-        "D=A",
-        f"@{index}",
-        "D=D+A",
-        "@R14",
-        "M=D",
-        "@R13",
-        "D=M",
-        "@R14",
-        "A=M",
-        "M=D",
-    ],
-    "push_pointer": lambda index: [
-        "@THIS",
-        "D=A",
-        f"@{index}",
-        "D=D+A",
-        "A=D",
-        "D=M",
-        "@SP",
-        "A=M",
-        "M=D",
-        "@SP",
-        "M=M+1",
-    ],
-    "pop_pointer": lambda index: [
-        "@SP",
-        "AM=M-1",
-        "D=M",
-        "@R13",
-        "M=D",
-        "@THIS",
-        "D=A",
-        f"@{index}",
-        "D=D+A",
-        "@R14",
-        "M=D",
-        "@R13",
-        "D=M",
-        "@R14",
-        "A=M",
-        "M=D",
-    ],
+    "push_local": lambda index: _push_segment("LCL", int(index)),
+    "pop_local": lambda index: _pop_segment("LCL", int(index)),
+    "push_argument": lambda index: _push_segment("ARG", int(index)),
+    "pop_argument": lambda index: _pop_segment("ARG", int(index)),
+    "push_this": lambda index: _push_segment("THIS", int(index)),
+    "pop_this": lambda index: _pop_segment("THIS", int(index)),
+    "push_that": lambda index: _push_segment("THAT", int(index)),
+    "pop_that": lambda index: _pop_segment("THAT", int(index)),
+    # temp and pointer are fixed RAM addresses, resolved here
+    "push_temp": lambda index: [f"@R{TEMP_BASE + int(index)}", "D=M", *PUSH_D],
+    "pop_temp": lambda index: [*POP_D, f"@R{TEMP_BASE + int(index)}", "M=D"],
+    "push_pointer": lambda index: [f"@{POINTER_ADDRESSES[int(index)]}", "D=M", *PUSH_D],
+    "pop_pointer": lambda index: [*POP_D, f"@{POINTER_ADDRESSES[int(index)]}", "M=D"],
     "push_static": lambda addr_f, index: [
         f"@{addr_f(index)}",
         "D=M",
@@ -324,20 +206,121 @@ PUSHPOP_ASSEMBLY_CODES = {
     ],
 }
 
+BOOTSTRAP_NAMESPACE = "$VM.INIT"
+CALL_TRAMPOLINE_LABEL = "$VM.CALL"
+RETURN_TRAMPOLINE_LABEL = "$VM.RETURN"
+
+# shared comparison routines: pop y and x, push x <op> y, return to R15
+COMPARE_JUMPS = {"eq": "JEQ", "gt": "JGT", "lt": "JLT"}
+COMPARE_ROUTINE_LABELS = {command: f"$VM.{command.upper()}" for command in COMPARE_JUMPS}
+
+# x <op> y computed in place on the stack top x, with y in D
+IN_PLACE_OPERATIONS = {"add": "M=D+M", "sub": "M=M-D", "and": "M=D&M", "or": "M=D|M"}
+# with the stack top y in D and A pointing at x, D = x <op> y
+CACHED_BINARY_OPERATIONS = {"add": "D=D+M", "sub": "D=M-D", "and": "D=D&M", "or": "D=D|M"}
+CACHED_UNARY_OPERATIONS = {"neg": "D=-D", "not": "D=!D"}
+# storing D below this index steps A up from the base, beyond it the value
+# goes through R13 (10 instructions)
+STORE_STEP_LIMIT = 8
+# functions with up to this many locals zero them without a loop: 2n+4
+# instructions and cycles, against 8 instructions and 6n+2 cycles
+UNROLLED_LOCALS_LIMIT = 4
+
 class CodeWriter:
 
-    def __init__(self, asm_file: str) -> None:
-        self.f = open(asm_file, "w")
+    def __init__(
+        self,
+        asm_file: str,
+        shared_calls: bool = False,
+        shared_compare: bool = False,
+        peephole: bool = False,
+        optimize: bool = False,
+        cache_top: bool = False,
+        eliminate_dead: bool = False,
+        inline: bool = False,
+        binary: bool = False,
+        keep_asm: bool = False,
+        source_map: bool = False,
+    ) -> None:
+        self.asm_file = asm_file
+        # with binary, close() links the encoded units into a ROM image next
+        # to asm_file (.rom) and writes the .asm only with keep_asm. A unit
+        # translated on its own carries its encoding in hack_object.
+        self.binary = binary
+        self.keep_asm = keep_asm
+        self.words = None
+        self.hack_object = None
+        self.objects = []
         self.name = os.path.basename(asm_file).removesuffix(".asm")
+        # generated labels are namespaced by VM file and counted per file,
+        # VM labels by function, so a file translates the same on its own.
+        # Labels of the bootstrap get their own namespace.
         self.vm_name = self.name
+        self.label_namespace = BOOTSTRAP_NAMESPACE
+        self.function_name = self.name
         self.counter = 0
+        # with shared_calls, call sites and returns jump to one copy of the
+        # frame setup/teardown code, emitted once by close()
+        self.shared_calls = shared_calls
+        # with shared_compare, eq/gt/lt jump to one routine per operator
+        self.shared_compare = shared_compare
+        self.used_trampolines = set()
+        # lines are buffered per unit (the bootstrap, a file, the shared
+        # routines), optimized with peephole and collected in output, which
+        # close() writes at once
+        self.optimizer: Union[PeepholeOptimizer, None] = PeepholeOptimizer() if peephole else None
+        self.buffer: List[str] = []
+        self.output: List[str] = []
+        # seconds spent per phase, filled by translate() and close()
+        self.timings: Dict[str, float] = {"parse": 0.0, "codegen": 0.0, "io": 0.0}
+        # the ObjectCache translate() reused files from, if any
+        self.cache = None
+        # with optimize, the translator rewrites VM commands before code generation
+        self.vm_optimizer: Union[VMOptimizer, None] = VMOptimizer() if optimize else None
+        # with eliminate_dead, functions unreachable from Sys.init are dropped
+        self.eliminator: Union[DeadFunctionEliminator, None] = (
+            DeadFunctionEliminator() if eliminate_dead else None
+        )
+        # with inline, calls to small leaf functions are replaced by their bodies
+        self.inliner: Union[Inliner, None] = Inliner() if inline else None
+        # with cache_top, the stack top may live in D instead of RAM[SP-1]
+        # while top_in_d is set, SP then does not count it. It is spilled
+        # before labels, jumps, calls and returns, so it is never live there.
+        self.cache_top = cache_top
+        self.top_in_d = False
+        # with source_map, the first line written for a VM command is tagged
+        # with its origin and close() writes the ROM address ranges of the
+        # origins to a .map next to asm_file. source_line is the VM line of
+        # the command being written, 0 for code without one.
+        self.source_map = source_map
+        self.source_line = None
 
     def writeInit(self) -> None:
+        self.setSource(0)
         self._write_lines(["@256", "D=A", "@SP", "M=D"])
         self.writeCall("Sys.init", 0)
 
     def writeArithmetic(self, command: str) -> None:
-        if command in ["eq", "gt", "lt"]:
+        if self.cache_top and not (command in COMPARE_JUMPS and self.shared_compare):
+            self._write_cached_arithmetic(command)
+            return
+        self._spill()
+        if command in COMPARE_JUMPS and self.shared_compare:
+            routine_label = COMPARE_ROUTINE_LABELS[command]
+            ret_label = self._get_label(f"{command.upper()}.RETADDR")
+            self.used_trampolines.add(routine_label)
+            self._write_lines(
+                [
+                    f"@{ret_label}",
+                    "D=A",
+                    "@R15",
+                    "M=D",
+                    f"@{routine_label}",
+                    "0;JMP",
+                    f"({ret_label})",
+                ]
+            )
+        elif command in ["eq", "gt", "lt"]:
             self._write_lines(ARITHMETIC_ASSEMBLY_CODES[command](self._get_label))
         else:
             self._write_lines(ARITHMETIC_ASSEMBLY_CODES[command])
@@ -345,22 +328,154 @@ class CodeWriter:
     def writePushPop(
         self, command: str, segment: str, index: int
     ) -> None:
+        if self.cache_top:
+            self._write_cached_push_pop(command, segment, index)
+            return
         if segment == "static":
             self._write_lines(PUSHPOP_ASSEMBLY_CODES[f"{command}_{segment}"](self._get_static_addr, index))
         else:
             self._write_lines(PUSHPOP_ASSEMBLY_CODES[f"{command}_{segment}"](index))
 
+    def writeMove(
+        self, src_segment: str, src_index: int, dst_segment: str, dst_index: int
+    ) -> None:
+        """`push src_segment src_index` and `pop dst_segment dst_index` as one move."""
+        if self.cache_top:
+            # the cached push and pop already go through D only
+            self.writePushPop("push", src_segment, src_index)
+            self.writePushPop("pop", dst_segment, dst_index)
+            return
+        self._write_lines(
+            [*self._segment_value(src_segment, src_index), *self._store_d(dst_segment, dst_index)]
+        )
+
+    def writePushArithmetic(self, segment: str, index: int, command: str) -> None:
+        """`push segment index` and the binary `command` applied to the stack top."""
+        if self.cache_top:
+            # same size, and the result stays in D
+            self.writePushPop("push", segment, index)
+            self.writeArithmetic(command)
+            return
+        self._write_lines(
+            [*self._segment_value(segment, index), "@SP", "A=M-1", IN_PLACE_OPERATIONS[command]]
+        )
+
+    def _fixed_address(self, segment: str, index: int) -> Union[str, None]:
+        if segment == "static":
+            return self._get_static_addr(index)
+        elif segment == "temp":
+            return f"R{TEMP_BASE + index}"
+        elif segment == "pointer":
+            return POINTER_ADDRESSES[index]
+        return None
+
+    def _segment_value(self, segment: str, index: int) -> List[str]:
+        # D = the value `push segment index` would push
+        if segment == "constant":
+            return _load_constant(index)
+        address = self._fixed_address(segment, index)
+        if address is not None:
+            return [f"@{address}", "D=M"]
+        return [*_segment_address(SEGMENT_POINTERS[segment], index), "D=M"]
+
+    def _store_d(self, segment: str, index: int) -> List[str]:
+        # RAM[the address of `segment index`] = D
+        address = self._fixed_address(segment, index)
+        if address is not None:
+            return [f"@{address}", "M=D"]
+        base = SEGMENT_POINTERS[segment]
+        if index < STORE_STEP_LIMIT:
+            return [*_step_address(base, index), "M=D"]
+        # D = address + value, so D - value is the address and D - address the value
+        return ["@R13", "M=D", f"@{base}", "D=M", f"@{index}", "D=D+A", "@R13", "D=D+M", "A=D-M", "M=D-A"]
+
+    def _write_cached_arithmetic(self, command: str) -> None:
+        lines = self._pop_to_d()
+        if command in CACHED_UNARY_OPERATIONS:
+            lines.append(CACHED_UNARY_OPERATIONS[command])
+        elif command in CACHED_BINARY_OPERATIONS:
+            lines += ["@SP", "AM=M-1", CACHED_BINARY_OPERATIONS[command]]
+        else:
+            true_label = self._get_label(f"{command.upper()}.TRUE")
+            end_label = self._get_label(f"{command.upper()}.END")
+            lines += [
+                "@SP",
+                "AM=M-1",
+                "D=M-D",
+                f"@{true_label}",
+                f"D;{COMPARE_JUMPS[command]}",
+                "D=0",
+                f"@{end_label}",
+                "0;JMP",
+                f"({true_label})",
+                "D=-1",
+                f"({end_label})",
+            ]
+        self._write_lines(lines)
+        self.top_in_d = True
+
+    def _write_cached_push_pop(self, command: str, segment: str, index: Union[int, str]) -> None:
+        if segment != "static":  # inlined statics are named in full
+            index = int(index)
+        if command == "push":
+            self._spill()
+            self._write_lines(self._segment_value(segment, index))
+            self.top_in_d = True
+            return
+
+        self._write_lines([*self._pop_to_d(), *self._store_d(segment, index)])
+        self.top_in_d = False
+
+    def _pop_to_d(self) -> List[str]:
+        """Lines moving the stack top into D, none if it already is."""
+        if self.top_in_d:
+            self.top_in_d = False
+            return []
+        return ["@SP", "AM=M-1", "D=M"]
+
+    def _spill(self) -> None:
+        if self.top_in_d:
+            self.top_in_d = False
+            self._write_lines(["@SP", "A=M", "M=D", "@SP", "M=M+1"])
+
     def writeLabel(self, label: str) -> None:
-        self._write_lines([f"({label})"])
+        self._spill()
+        self._write_lines([f"({self._get_vm_label(label)})"])
 
     def writeGoto(self, label: str) -> None:
-        self._write_lines([f"@{label}", "0;JMP"])
+        self._spill()
+        self._write_lines([f"@{self._get_vm_label(label)}", "0;JMP"])
 
     def writeIf(self, label: str) -> None:
+        label = self._get_vm_label(label)
+        if self.cache_top:
+            self._write_lines([*self._pop_to_d(), f"@{label}", "D;JNE"])
+            return
         self._write_lines(["@SP", "AM=M-1", "D=M", f"@{label}", "D;JNE"])
 
     def writeCall(self, funcName: str, numArgs: int) -> None:
+        self._spill()
         ret_label = self._get_label(f"FUNC.{funcName}.RETADDR")
+        if self.shared_calls:
+            self.used_trampolines.add(CALL_TRAMPOLINE_LABEL)
+            self._write_lines(
+                [
+                    f"@{numArgs}",
+                    "D=A",
+                    "@R13",
+                    "M=D",
+                    f"@{funcName}",
+                    "D=A",
+                    "@R14",
+                    "M=D",
+                    f"@{ret_label}",
+                    "D=A",
+                    f"@{CALL_TRAMPOLINE_LABEL}",
+                    "0;JMP",
+                    f"({ret_label})",
+                ]
+            )
+            return
         self._write_lines(
             [
                 f"@{ret_label}",
@@ -393,74 +508,227 @@ class CodeWriter:
         )
 
     def writeReturn(self) -> None:
-        self._write_lines(
-            [
-                "@LCL",
-                "D=M",
-                "@R13",
-                "M=D",
-                "@5",
-                "D=A",
-                "@R13",
-                "A=M-D",
-                "D=M",
-                "@R14",
-                "M=D",
-                "@SP",
-                "AM=M-1",
-                "D=M",
-                "@ARG",
-                "A=M",
-                "M=D",
-                "@ARG",
-                "D=M+1",
-                "@SP",
-                "M=D",
-                *PUSHPOP_ASSEMBLY_CODES["pop_segaddr"]("THAT", 1),
-                *PUSHPOP_ASSEMBLY_CODES["pop_segaddr"]("THIS", 2),
-                *PUSHPOP_ASSEMBLY_CODES["pop_segaddr"]("ARG", 3),
-                *PUSHPOP_ASSEMBLY_CODES["pop_segaddr"]("LCL", 4),
-                "@R14",
-                "A=M",
-                "0;JMP"
-            ]
-        )
+        self._spill()
+        if self.shared_calls:
+            self.used_trampolines.add(RETURN_TRAMPOLINE_LABEL)
+            self._write_lines([f"@{RETURN_TRAMPOLINE_LABEL}", "0;JMP"])
+            return
+        self._write_lines(self._return_lines())
+
+    def _call_trampoline_lines(self) -> List[str]:
+        # D = return address, R13 = numArgs, R14 = callee address
+        return [
+            f"({CALL_TRAMPOLINE_LABEL})",
+            "@SP",
+            "A=M",
+            "M=D",
+            "@SP",
+            "M=M+1",
+            *PUSHPOP_ASSEMBLY_CODES["push_segaddr"]("LCL"),
+            *PUSHPOP_ASSEMBLY_CODES["push_segaddr"]("ARG"),
+            *PUSHPOP_ASSEMBLY_CODES["push_segaddr"]("THIS"),
+            *PUSHPOP_ASSEMBLY_CODES["push_segaddr"]("THAT"),
+            "@R13",
+            "D=M",
+            "@5",
+            "D=D+A",
+            "@SP",
+            "D=M-D",
+            "@ARG",
+            "M=D",
+            "@SP",
+            "D=M",
+            "@LCL",
+            "M=D",
+            "@R14",
+            "A=M",
+            "0;JMP",
+        ]
+
+    def _compare_routine_lines(self, command: str) -> List[str]:
+        routine_label = COMPARE_ROUTINE_LABELS[command]
+        return [
+            f"({routine_label})",
+            "@SP",
+            "AM=M-1",
+            "D=M",
+            "A=A-1",
+            "D=M-D",
+            "M=-1",
+            f"@{routine_label}.END",
+            f"D;{COMPARE_JUMPS[command]}",
+            "@SP",
+            "A=M-1",
+            "M=0",
+            f"({routine_label}.END)",
+            "@R15",
+            "A=M",
+            "0;JMP",
+        ]
+
+    def _return_lines(self) -> List[str]:
+        return [
+            "@LCL",
+            "D=M",
+            "@R13",
+            "M=D",
+            "@5",
+            "D=A",
+            "@R13",
+            "A=M-D",
+            "D=M",
+            "@R14",
+            "M=D",
+            "@SP",
+            "AM=M-1",
+            "D=M",
+            "@ARG",
+            "A=M",
+            "M=D",
+            "@ARG",
+            "D=M+1",
+            "@SP",
+            "M=D",
+            *PUSHPOP_ASSEMBLY_CODES["pop_segaddr"]("THAT", 1),
+            *PUSHPOP_ASSEMBLY_CODES["pop_segaddr"]("THIS", 2),
+            *PUSHPOP_ASSEMBLY_CODES["pop_segaddr"]("ARG", 3),
+            *PUSHPOP_ASSEMBLY_CODES["pop_segaddr"]("LCL", 4),
+            "@R14",
+            "A=M",
+            "0;JMP",
+        ]
 
     def writeFunction(self, funcName: str, numLocals: int) -> None:
+        self._spill()
+        self.function_name = funcName
+        self._write_lines([f"({funcName})", *self._init_locals_lines(funcName, numLocals)])
+
+    def _init_locals_lines(self, funcName: str, numLocals: int) -> List[str]:
+        """Pushes numLocals zeros, unrolled up to UNROLLED_LOCALS_LIMIT."""
+        if numLocals == 0:
+            return []
+        if numLocals == 1:
+            return ["@SP", "AM=M+1", "A=A-1", "M=0"]
+        if numLocals <= UNROLLED_LOCALS_LIMIT:
+            # SP moves past all locals at once, they are zeroed downwards
+            return [*_load_constant(numLocals), "@SP", "AM=D+M", *["A=A-1", "M=0"] * numLocals]
         init_lcls_label = self._get_label(f"FUNC.{funcName}.INITLCLS")
-        fin_lcls_label = self._get_label(f"FUNC.{funcName}.FINLCLS")
-        self._write_lines(
-            [
-                f"({funcName})",
-                f"@{numLocals}",
-                "D=A",
-                f"({init_lcls_label})",
-                f"@{fin_lcls_label}",
-                "D;JEQ",
-                "@SP",
-                "A=M",
-                "M=0",
-                "@SP",
-                "M=M+1",
-                "D=D-1",
-                f"@{init_lcls_label}",
-                "D;JNE",
-                f"({fin_lcls_label})",
-            ]
-        )
+        return [
+            *_load_constant(numLocals),
+            f"({init_lcls_label})",
+            "@SP",
+            "AM=M+1",
+            "A=A-1",
+            "M=0",
+            f"@{init_lcls_label}",
+            "D=D-1;JNE",
+        ]
 
     def close(self) -> None:
-        self.f.close()
+        self._spill()
+        self.setSource(0)
+        if CALL_TRAMPOLINE_LABEL in self.used_trampolines:
+            self._write_lines(self._call_trampoline_lines())
+        if RETURN_TRAMPOLINE_LABEL in self.used_trampolines:
+            self._write_lines([f"({RETURN_TRAMPOLINE_LABEL})", *self._return_lines()])
+        for command, routine_label in COMPARE_ROUTINE_LABELS.items():
+            if routine_label in self.used_trampolines:
+                self._write_lines(self._compare_routine_lines(command))
+        self._append_output(self.takeLines())
+        if self.binary:
+            encoder = HackEncoder()
+            for hack_object in self.objects:
+                encoder.link(hack_object)
+            self.words = encoder.finish()
+
+        start = perf_counter()
+        if self.binary:
+            write_image(self.romFile(), self.words, encoder.symbol_table)
+        if not self.binary or self.keep_asm:
+            with open(self.asm_file, "w") as f:
+                f.write("\n".join(self.output) + "\n")
+        if self.source_map:
+            self.sourceMap().write(self.mapFile())
+        self.timings["io"] += perf_counter() - start
+
+    def romFile(self) -> str:
+        return self.asm_file.removesuffix(".asm") + ".rom"
+
+    def mapFile(self) -> str:
+        return self.asm_file.removesuffix(".asm") + ".map"
+
+    def sourceMap(self) -> SourceMapWriter:
+        """The ROM address ranges of the VM lines in output."""
+        writer = SourceMapWriter()
+        address = 0
+        for line in self.output:
+            origin = origin_of(line)
+            if origin is not None:
+                writer.add(address, *origin)
+            if not line.startswith("("):
+                address += 1
+        return writer
+
+    def setSource(self, line_number: int) -> None:
+        """The next line written starts the code of VM line `line_number` of the current file."""
+        if self.source_map:
+            self.source_line = line_number
+
+    def takeLines(self) -> List[str]:
+        """Returns the lines written since the last call, optimized with peephole."""
+        self._spill()
+        lines, self.buffer = self.buffer, []
+        if self.optimizer is not None:
+            lines = self.optimizer.optimize(lines)
+        return lines
+
+    def link(
+        self, lines: List[str], used_trampolines: Set[str], hack_object: Union[HackObject, None] = None
+    ) -> None:
+        """
+        Appends the lines of a file translated by another CodeWriter, after
+        what was written here so far. Shared routines it uses are emitted by
+        close() like those used here. With binary, `hack_object` is their
+        encoding when it is known already.
+        """
+        self._append_output(self.takeLines())
+        self._append_output(lines, hack_object)
+        self.used_trampolines |= used_trampolines
+
+    def _append_output(self, lines: List[str], hack_object: Union[HackObject, None] = None) -> None:
+        self.output += lines
+        if self.binary:
+            self.objects.append(hack_object if hack_object is not None else HackObject.encode(lines))
 
     def setVmFile(self, filename: str) -> None:
+        self._spill()
         self.vm_name = os.path.basename(filename).removesuffix(".vm")
+        self.label_namespace = self.vm_name
+        self.function_name = self.vm_name
+        self.counter = 0
 
     def _get_label(self, prefix: str) -> str:
         self.counter += 1
-        return f"{self.name}.{prefix}.{self.counter}"
+        return f"{self.label_namespace}.{prefix}.{self.counter}"
+
+    def _get_vm_label(self, label: str) -> str:
+        # VM labels are local to their function
+        return f"{self.function_name}${label}"
 
-    def _get_static_addr(self, index: int) -> str:
+    def _get_static_addr(self, index: Union[int, str]) -> str:
+        # the inliner names statics of other files in full, "File.index"
+        if isinstance(index, str):
+            return index
         return f"{self.vm_name}.{index}"
 
     def _write_lines(self, codes: List[str]):
-        self.f.writelines("\n".join(codes) + "\n")
+        if self.source_line is not None and len(codes) > 0:
+            if self.source_line == 0:
+                origin = ("", 0, "")
+            else:
+                origin = (f"{self.vm_name}.vm", self.source_line, self.function_name)
+            self.buffer.append(SourceLine(codes[0], origin))
+            self.buffer.extend(codes[1:])
+            self.source_line = None
+            return
+        self.buffer.extend(codes)
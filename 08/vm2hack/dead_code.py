@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+from typing import Dict, List, Set
+
+from .parser import Command
+
+ENTRY_FUNCTION = "Sys.init"
+
+
+def split_functions(commands: List[Command]) -> List[List[Command]]:
+    """
+    Splits the commands of a VM file at every `function` command. The first
+    part holds what comes before the first function, usually nothing.
+    """
+    parts: List[List[Command]] = [[]]
+    for command in commands:
+        if command.kind == "function":
+            parts.append([])
+        parts[-1].append(command)
+    return parts
+
+
+class DeadFunctionEliminator:
+    """
+    Drops the functions of a whole program that cannot be reached from
+    Sys.init over `call` commands. Code outside of any function is kept
+    and its calls count as reachable too. Programs without Sys.init are
+    left alone, nothing is known about their entry points.
+    """
+
+    def __init__(self, entry: str = ENTRY_FUNCTION) -> None:
+        self.entry = entry
+        # dropped function name -> number of VM commands it had
+        self.dropped: Dict[str, int] = dict()
+
+    def eliminate(self, files: List[List[Command]]) -> List[List[Command]]:
+        bodies: Dict[str, List[Command]] = dict()
+        roots: List[str] = []
+        for commands in files:
+            prelude, *functions = split_functions(commands)
+            roots += [command.args[0] for command in prelude if command.kind == "call"]
+            for function in functions:
+                bodies[function[0].args[0]] = function
+        if self.entry not in bodies:
+            return files
+
+        reachable = self._reachable(bodies, [self.entry, *roots])
+        kept_files = []
+        for commands in files:
+            prelude, *functions = split_functions(commands)
+            kept = prelude
+            for function in functions:
+                name = function[0].args[0]
+                if name in reachable:
+                    kept += function
+                else:
+                    self.dropped[name] = len(function)
+            kept_files.append(kept)
+        return kept_files
+
+    def _reachable(self, bodies: Dict[str, List[Command]], roots: List[str]) -> Set[str]:
+        reachable: Set[str] = set()
+        worklist = list(roots)
+        while worklist:
+            name = worklist.pop()
+            if name in reachable or name not in bodies:
+                continue
+            reachable.add(name)
+            worklist += [command.args[0] for command in bodies[name] if command.kind == "call"]
+        return reachable
+
+    def report(self) -> List[str]:
+        return [
+            *(f"  {name:<32} {count:>6} commands" for name, count in sorted(self.dropped.items())),
+            f"  dropped {len(self.dropped)} functions, {sum(self.dropped.values())} commands",
+        ]
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+
+from typing import Dict, List, Set, Union
+
+from .dead_code import split_functions
+from .parser import Command
+
+# temp slots an inlined body may keep its arguments, locals and saved
+# pointers in
+TEMP_SLOTS = range(8)
+DEFAULT_MAX_SIZE = 16
+DEFAULT_BUDGET = 2000
+
+STACK_EFFECTS = {
+    "push": 1,
+    "pop": -1,
+    "add": -1,
+    "sub": -1,
+    "eq": -1,
+    "gt": -1,
+    "lt": -1,
+    "and": -1,
+    "or": -1,
+    "neg": 0,
+    "not": 0,
+    "if-goto": -1,
+    "goto": 0,
+    "label": 0,
+}
+
+
+class Leaf:
+    """A function without calls that can be inlined, see Inliner.leaf()."""
+
+    def __init__(self, name: str, file_name: str, num_locals: int, body: List[Command]) -> None:
+        self.name = name
+        self.file_name = file_name
+        self.num_locals = num_locals
+        self.body = body
+        self.temps = _temps(body)
+        self.pointers = sorted(
+            {command.args[1] for command in body if command.kind == "pop" and command.args[0] == "pointer"}
+        )
+        self.num_args = 1 + max(
+            (command.args[1] for command in body if command.args[:1] == ("argument",)), default=-1
+        )
+
+
+class Inliner:
+    """
+    Substitutes the bodies of small leaf functions, functions that call
+    nothing, for the `call` commands to them, across the whole program.
+
+    An inlined body pops its arguments into temp slots, zeroes its locals
+    into temp slots, and `argument`/`local` are remapped onto those slots.
+    Slots are only taken when neither the body nor the calling function
+    touch them; temp is not preserved across calls anyway. Pointers the
+    body sets are saved and restored, as `return` would, statics are kept
+    those of the callee's file, and labels are renamed per call site. A
+    `return` becomes a jump to the end of the body.
+
+    Only bodies of at most `max_size` commands without loops, whose stack
+    depth is known at every label and is 1 at every `return`, are inlined,
+    and inlining stops once the program grew by `budget` commands.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE, budget: int = DEFAULT_BUDGET) -> None:
+        self.max_size = max_size
+        self.budget = budget
+        self.growth = 0
+        # inlined function name -> number of call sites
+        self.sites: Dict[str, int] = dict()
+        self.calls = 0
+
+    def inline(self, files: List[List[Command]], file_names: List[str]) -> List[List[Command]]:
+        leaves: Dict[str, Leaf] = dict()
+        for commands, file_name in zip(files, file_names):
+            for function in split_functions(commands)[1:]:
+                leaf = self.leaf(function, file_name)
+                if leaf is not None:
+                    leaves[leaf.name] = leaf
+
+        inlined_files = []
+        for commands in files:
+            inlined: List[Command] = []
+            for function in split_functions(commands):
+                caller_temps = _temps(function)
+                for command in function:
+                    if command.kind == "call":
+                        self.calls += 1
+                        leaf = leaves.get(command.args[0])
+                        if leaf is not None and self._fits(leaf, command.args[1], caller_temps):
+                            inlined += self._expand(leaf, command, caller_temps)
+                            continue
+                    inlined.append(command)
+            inlined_files.append(inlined)
+        return inlined_files
+
+    def leaf(self, function: List[Command], file_name: str) -> Union[Leaf, None]:
+        name, num_locals = function[0].args
+        body = function[1:]
+        if len(body) > self.max_size or any(command.kind in ("call", "function") for command in body):
+            return None
+        # functions that never return are left alone, and so are loops: they
+        # amortize the call, and Sys.halt must keep its address, see report.py
+        if not any(command.kind == "return" for command in body) or _loops(body):
+            return None
+        if not _balanced(body):
+            return None
+        return Leaf(name, file_name, num_locals, body)
+
+    def _fits(self, leaf: Leaf, num_args: int, caller_temps: Set[int]) -> bool:
+        if leaf.num_args > num_args:
+            return False
+        slots = num_args + leaf.num_locals + len(leaf.pointers)
+        return (
+            slots <= len(_free_slots(leaf, caller_temps))
+            and self.growth + len(leaf.body) + slots * 2 <= self.budget
+        )
+
+    def _expand(self, leaf: Leaf, call: Command, caller_temps: Set[int]) -> List[Command]:
+        site = sum(self.sites.values())
+        self.sites[leaf.name] = self.sites.get(leaf.name, 0) + 1
+        num_args = call.args[1]
+        line_number = call.line_number
+        free = _free_slots(leaf, caller_temps)
+
+        def command(kind: str, *args) -> Command:
+            # inlined code is attributed to the call site in source maps
+            return Command(kind, *args, line_number=line_number)
+
+        args = free[:num_args]
+        locals_ = free[num_args : num_args + leaf.num_locals]
+        saved = dict(zip(leaf.pointers, free[num_args + leaf.num_locals :]))
+        end_label = f"INLINE.{site}.{leaf.name}.END"
+
+        expanded = [command("pop", "temp", slot) for slot in reversed(args)]
+        for slot in locals_:
+            expanded += [command("push", "constant", 0), command("pop", "temp", slot)]
+        for pointer, slot in saved.items():
+            expanded += [command("push", "pointer", pointer), command("pop", "temp", slot)]
+
+        jumps = 0
+        for i, body_command in enumerate(leaf.body):
+            kind, body_args = body_command.kind, body_command.args
+            if kind == "return":
+                for pointer, slot in saved.items():
+                    expanded += [command("push", "temp", slot), command("pop", "pointer", pointer)]
+                if i < len(leaf.body) - 1:
+                    expanded.append(command("goto", end_label))
+                    jumps += 1
+            elif kind in ("label", "goto", "if-goto"):
+                expanded.append(command(kind, f"INLINE.{site}.{body_args[0]}"))
+            elif kind in ("push", "pop") and body_args[0] == "argument":
+                expanded.append(command(kind, "temp", args[body_args[1]]))
+            elif kind in ("push", "pop") and body_args[0] == "local":
+                expanded.append(command(kind, "temp", locals_[body_args[1]]))
+            elif kind in ("push", "pop") and body_args[0] == "static":
+                # statics stay those of the callee's file
+                expanded.append(command(kind, "static", f"{leaf.file_name}.{body_args[1]}"))
+            else:
+                expanded.append(command(kind, *body_args))
+        if jumps > 0:
+            expanded.append(command("label", end_label))
+        self.growth += len(expanded) - 1
+        return expanded
+
+    def report(self) -> List[str]:
+        inlined = sum(self.sites.values())
+        return [
+            *(f"  {name:<32} {count:>6} sites" for name, count in sorted(self.sites.items())),
+            f"  inlined {inlined} of {self.calls} calls, {len(self.sites)} functions, +{self.growth} commands",
+        ]
+
+
+def _temps(commands: List[Command]) -> Set[int]:
+    return {command.args[1] for command in commands if command.args[:1] == ("temp",)}
+
+
+def _free_slots(leaf: Leaf, caller_temps: Set[int]) -> List[int]:
+    return [slot for slot in TEMP_SLOTS if slot not in leaf.temps and slot not in caller_temps]
+
+
+def _loops(body: List[Command]) -> bool:
+    """Whether `body` jumps back to a label it already passed."""
+    labels: Set[str] = set()
+    for command in body:
+        if command.kind == "label":
+            labels.add(command.args[0])
+        elif command.kind in ("goto", "if-goto") and command.args[0] in labels:
+            return True
+    return False
+
+
+def _balanced(body: List[Command]) -> bool:
+    """
+    Whether the stack depth of `body` is known at every label, never below
+    the depth it starts at, and 1 at every `return`, so that a return can
+    become a jump with only the return value left on the stack.
+    """
+    depths: Dict[str, int] = dict()
+    depth: Union[int, None] = 0
+    for command in body:
+        if command.kind == "label":
+            label = command.args[0]
+            if label not in depths:
+                depths[label] = depth
+            elif depth is None or depth == depths[label]:
+                depth = depths[label]
+            else:
+                return False
+            continue
+        if depth is None:
+            # unreachable until the next label
+            continue
+        if command.kind == "return":
+            if depth != 1:
+                return False
+            depth = None
+            continue
+        if command.kind not in STACK_EFFECTS:
+            return False
+        depth += STACK_EFFECTS[command.kind]
+        if depth < 0:
+            return False
+        if command.kind in ("goto", "if-goto"):
+            if depths.setdefault(command.args[0], depth) != depth:
+                return False
+            if command.kind == "goto":
+                depth = None
+    # falling off the end would run into the next function
+    return depth is None
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+from typing import Callable, Dict, List, Union
+
+from .parser import Command, Parser
+
+ARITHMETIC_COMMANDS = Parser.CommandType.C_ARITHMETIC.value
+
+
+def _to_signed(value: int) -> int:
+    value &= 0xFFFF
+    return value - 0x10000 if value & 0x8000 else value
+
+
+# gt and lt test the sign of the 16-bit x - y like the generated code, which
+# differs from comparing x and y when the difference overflows
+BINARY_FOLDS: Dict[str, Callable[[int, int], int]] = {
+    "add": lambda x, y: x + y,
+    "sub": lambda x, y: x - y,
+    "and": lambda x, y: x & y,
+    "or": lambda x, y: x | y,
+    "eq": lambda x, y: -1 if x == y else 0,
+    "gt": lambda x, y: -1 if _to_signed(x - y) > 0 else 0,
+    "lt": lambda x, y: -1 if _to_signed(x - y) < 0 else 0,
+}
+UNARY_FOLDS: Dict[str, Callable[[int], int]] = {
+    "neg": lambda x: -x,
+    "not": lambda x: ~x,
+}
+# binary operators a pushed operand can be fused into
+FUSED_OPERATORS = ["add", "sub", "and", "or"]
+
+
+def _constant(command: Command) -> Union[int, None]:
+    if command.kind == "push" and command.args[0] == "constant":
+        return command.args[1]
+    return None
+
+
+class VMOptimizer:
+    """
+    Rewrites the commands of a VM file before code generation.
+
+    fold    : arithmetic on constants is computed, `push constant 0` followed
+              by add/sub/or is dropped
+    move    : a push directly followed by a pop becomes one memory move
+    push-op : a push directly followed by add/sub/and/or becomes one
+              instruction operating on the stack top in place
+
+    Labels are commands too, so nothing is combined across a jump target.
+    """
+
+    def __init__(self) -> None:
+        self.hits = {"fold": 0, "move": 0, "push-op": 0}
+        self.commands_in = 0
+        self.commands_out = 0
+
+    def optimize(self, commands: List[Command]) -> List[Command]:
+        self.commands_in += len(commands)
+        folded: List[Command] = []
+        for command in commands:
+            folded.append(command)
+            self._fold(folded)
+
+        fused: List[Command] = []
+        i = 0
+        while i < len(folded):
+            command = folded[i]
+            next_command = folded[i + 1] if i + 1 < len(folded) else None
+            if command.kind == "push" and next_command is not None:
+                if next_command.kind == "pop":
+                    fused.append(
+                        Command("move", *command.args, *next_command.args, line_number=command.line_number)
+                    )
+                    self.hits["move"] += 1
+                    i += 2
+                    continue
+                if next_command.kind in FUSED_OPERATORS:
+                    fused.append(
+                        Command("push-op", *command.args, next_command.kind, line_number=command.line_number)
+                    )
+                    self.hits["push-op"] += 1
+                    i += 2
+                    continue
+            fused.append(command)
+            i += 1
+        self.commands_out += len(fused)
+        return fused
+
+    def _fold(self, commands: List[Command]) -> None:
+        """
+        Folds the end of `commands` for as long as it changes. A folded
+        constant keeps the line number of the first command it replaces.
+        """
+        while len(commands) >= 2:
+            kind = commands[-1].kind
+            x = _constant(commands[-2])
+            if kind in UNARY_FOLDS and x is not None:
+                commands[-2:] = [
+                    Command(
+                        "push", "constant", _to_signed(UNARY_FOLDS[kind](x)), line_number=commands[-2].line_number
+                    )
+                ]
+            elif kind in ["add", "sub", "or"] and x == 0:
+                del commands[-2:]
+            elif kind in BINARY_FOLDS and len(commands) >= 3 and x is not None:
+                y = x
+                x = _constant(commands[-3])
+                if x is None:
+                    return
+                commands[-3:] = [
+                    Command(
+                        "push", "constant", _to_signed(BINARY_FOLDS[kind](x, y)), line_number=commands[-3].line_number
+                    )
+                ]
+            else:
+                return
+            self.hits["fold"] += 1
+
+    def merge(self, other: "VMOptimizer") -> None:
+        """Adds the counts of an optimizer that ran on another part of the program."""
+        for name, hits in other.hits.items():
+            self.hits[name] += hits
+        self.commands_in += other.commands_in
+        self.commands_out += other.commands_out
+
+    def report(self) -> List[str]:
+        saved = self.commands_in - self.commands_out
+        percent = saved * 100 / self.commands_in if self.commands_in else 0
+        return [
+            *(f"  {name:<18} {hits:>8} hits" for name, hits in self.hits.items()),
+            f"  commands {self.commands_in} -> {self.commands_out} (-{saved}, -{percent:.1f}%)",
+        ]
@@ -1,8 +1,57 @@
 # -*- coding: utf-8 -*-
 
-from typing import List
+import sys
+from typing import Dict, List, Union
 from enum import Enum
 
+# commands whose last argument is a number
+INDEXED_KINDS = ["push", "pop", "function", "call"]
+
+
+class Command:
+    """
+    One VM command, kind is its keyword ("push", "add", "call", ...).
+    Indexes and counts are ints, constants may be any 16-bit signed value.
+    Keywords, segments and names are interned, they are compared and looked
+    up in dicts over and over by the later stages.
+
+    The optimizer also produces fused kinds:
+    move    : args (segment, index, segment, index), a push and a pop
+    push-op : args (segment, index, operator), a push and add/sub/and/or
+
+    The inliner names the statics of another file as "File.index" strings.
+    """
+
+    __slots__ = ("kind", "args", "line_number")
+
+    def __init__(self, kind: str, *args: Union[str, int], line_number: int = 0) -> None:
+        self.kind = kind
+        self.args = args
+        self.line_number = line_number
+
+    def __repr__(self) -> str:
+        return " ".join(map(str, (self.kind, *self.args)))
+
+
+def parse_line(line: str, line_number: int = 0) -> Union[Command, None]:
+    parts = line.split("//")[0].split()
+    if len(parts) == 0:
+        return None
+    kind, *args = map(sys.intern, parts)
+    if kind in INDEXED_KINDS:
+        args[-1] = int(args[-1])
+    return Command(kind, *args, line_number=line_number)
+
+
+def parse_lines(lines: List[str]) -> List[Command]:
+    commands = []
+    for line_number, line in enumerate(lines, 1):
+        command = parse_line(line, line_number)
+        if command is not None:
+            commands.append(command)
+    return commands
+
+
 class Parser:
 
     class CommandType(Enum):
@@ -20,48 +69,38 @@ class Parser:
 
         self.vm_file = vm_file
         with open(vm_file) as f:
-            self.lines = f.readlines()
-            assert(len(self.lines) > 0)
+            lines = f.readlines()
+            assert(len(lines) > 0)
 
-        self.line = None
-        self.parts = []
-        self.line_index = 0
+        # every line is tokenized once, advance() only steps through them
+        self.commands = parse_lines(lines)
+        self.command_index = 0
+        self.command: Union[Command, None] = None
 
     def getVmFile(self) -> None:
         return self.vm_file 
     
     def hasMoreCommands(self) -> bool:
-        return self.line_index < len(self.lines)
+        return self.command_index < len(self.commands)
 
     def advance(self) -> None:
         assert(self.hasMoreCommands())
-        self.line = self.lines[self.line_index].split("//")[0].strip()
-        self.line_index += 1
-        while(len(self.line) == 0):
-            if not self.hasMoreCommands():
-                break
-            self.advance()
-
-        if len(self.line) != 0:
-            self.parts = self.line.split(" ")
+        self.command = self.commands[self.command_index]
+        self.command_index += 1
 
     def commandType(self) -> CommandType:
-        for ctype in Parser.CommandType:
-            if self.parts[0] in ctype.value:
-                return ctype
-        assert(True)
-        return None
+        return COMMAND_TYPES[self.command.kind]
 
     def arg1(self) -> str:
         assert self._check_has_arg1()
         if self.commandType() == Parser.CommandType.C_ARITHMETIC:
-            return self.parts[0]
+            return self.command.kind
         else:
-            return self.parts[1]
+            return self.command.args[0]
 
     def arg2(self) -> int:
         assert self._check_has_arg2()
-        return self.parts[2]
+        return self.command.args[1]
 
     def _check_has_arg1(self) -> bool:
         return not self.commandType() == Parser.CommandType.C_RETURN
@@ -73,3 +112,8 @@ class Parser:
             Parser.CommandType.C_FUNCTION,
             Parser.CommandType.C_CALL,
         ]
+
+
+COMMAND_TYPES: Dict[str, Parser.CommandType] = {
+    keyword: command_type for command_type in Parser.CommandType for keyword in command_type.value
+}
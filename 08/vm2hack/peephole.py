@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from .source_map import origin_of, with_origin
+
+Rule = Callable[[List[str]], Tuple[List[str], int]]
+
+
+class _Lines(list):
+    """
+    The lines a rule keeps. The source origin of a dropped line (see
+    source_map) moves to the next line kept, so source maps still find
+    where the code of every VM command starts.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.origin = None
+
+    def keep(self, line: str) -> None:
+        if self.origin is not None:
+            line = with_origin(line, self.origin)
+            self.origin = None
+        self.append(line)
+
+    def keep_all(self, lines: Iterable[str]) -> None:
+        for line in lines:
+            self.keep(line)
+
+    def drop(self, lines: Iterable[str]) -> None:
+        for line in lines:
+            if self.origin is None:
+                self.origin = origin_of(line)
+
+
+def _is_label(line: str) -> bool:
+    return line.startswith("(")
+
+
+def push_pop(lines: List[str]) -> Tuple[List[str], int]:
+    """
+    `@SP M=M+1 @SP AM=M-1`: a push immediately popped again. SP ends where
+    it started and A must point at the pushed slot, which `@SP A=M` does.
+    """
+    out = _Lines()
+    hits = 0
+    i = 0
+    while i < len(lines):
+        if lines[i : i + 4] == ["@SP", "M=M+1", "@SP", "AM=M-1"]:
+            out.keep(lines[i])
+            out.drop(lines[i + 1 : i + 4])
+            out.keep("A=M")
+            hits += 1
+            i += 4
+        else:
+            out.keep(lines[i])
+            i += 1
+    return out, hits
+
+
+def store_reload(lines: List[str]) -> Tuple[List[str], int]:
+    """
+    `@SP A=M M=D @SP A=M D=M`: reloading the stack slot just stored from D,
+    typically left behind by push-pop. SP did not change, so A and D already
+    hold the right values.
+    """
+    pattern = ["@SP", "A=M", "M=D", "@SP", "A=M", "D=M"]
+    out = _Lines()
+    hits = 0
+    i = 0
+    while i < len(lines):
+        if lines[i : i + 6] == pattern:
+            out.keep_all(lines[i : i + 3])
+            out.drop(lines[i + 3 : i + 6])
+            hits += 1
+            i += 6
+        else:
+            out.keep(lines[i])
+            i += 1
+    return out, hits
+
+
+def redundant_a_load(lines: List[str]) -> Tuple[List[str], int]:
+    """
+    Drops `@X` when A already holds X: the previous A-instruction loaded the
+    same value and nothing since wrote A or could be jumped to. Also drops an
+    A-instruction that is immediately overwritten by another one.
+    """
+    out = _Lines()
+    hits = 0
+    current = None  # the A-instruction A is known to hold
+    for i, line in enumerate(lines):
+        if line.startswith("@"):
+            if line == current:
+                out.drop([line])
+                hits += 1
+                continue
+            if i + 1 < len(lines) and lines[i + 1].startswith("@"):
+                out.drop([line])
+                hits += 1
+                continue
+            current = line
+        elif _is_label(line):
+            current = None
+        elif "=" in line and "A" in line.split("=")[0]:
+            current = None
+        out.keep(line)
+    return out, hits
+
+
+def jump_to_next(lines: List[str]) -> Tuple[List[str], int]:
+    """`@L D;JNE (L)`: a jump without dest to the very next instruction."""
+    out = _Lines()
+    hits = 0
+    i = 0
+    while i < len(lines):
+        if (
+            i + 2 < len(lines)
+            and lines[i].startswith("@")
+            and ";" in lines[i + 1]
+            and "=" not in lines[i + 1]
+            and lines[i + 2] == f"({lines[i][1:]})"
+        ):
+            out.drop(lines[i : i + 2])
+            hits += 1
+            i += 2
+        else:
+            out.keep(lines[i])
+            i += 1
+    return out, hits
+
+
+DEFAULT_RULES: Dict[str, Rule] = {
+    "push-pop": push_pop,
+    "store-reload": store_reload,
+    "redundant-a-load": redundant_a_load,
+    "jump-to-next": jump_to_next,
+}
+
+
+class PeepholeOptimizer:
+    """
+    Rewrites a list of Hack assembly lines with a set of named rules.
+
+    Every rule is a function taking the lines and returning the rewritten
+    lines and its number of hits. The rules are applied in order, repeatedly,
+    until none of them changes anything.
+    """
+
+    def __init__(self, rules: Dict[str, Rule] = DEFAULT_RULES, max_passes: int = 8) -> None:
+        self.rules = rules
+        self.max_passes = max_passes
+        self.hits = {name: 0 for name in rules}
+        self.lines_in = 0
+        self.lines_out = 0
+
+    def optimize(self, lines: List[str]) -> List[str]:
+        self.lines_in += _count_instructions(lines)
+        for _ in range(self.max_passes):
+            changed = False
+            for name, rule in self.rules.items():
+                lines, hits = rule(lines)
+                self.hits[name] += hits
+                changed = changed or hits > 0
+            if not changed:
+                break
+        self.lines_out += _count_instructions(lines)
+        return lines
+
+    def merge(self, other: "PeepholeOptimizer") -> None:
+        """Adds the counts of an optimizer that ran on another part of the program."""
+        for name, hits in other.hits.items():
+            self.hits[name] += hits
+        self.lines_in += other.lines_in
+        self.lines_out += other.lines_out
+
+    def report(self) -> List[str]:
+        saved = self.lines_in - self.lines_out
+        percent = saved * 100 / self.lines_in if self.lines_in else 0
+        return [
+            *(f"  {name:<18} {hits:>8} hits" for name, hits in self.hits.items()),
+            f"  instructions {self.lines_in} -> {self.lines_out} (-{saved}, -{percent:.1f}%)",
+        ]
+
+
+def _count_instructions(lines: List[str]) -> int:
+    return sum(1 for line in lines if not _is_label(line))
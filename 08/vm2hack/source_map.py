@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+
+"""
+Source maps, shared by vm2hack (ROM address -> VM file/line/function, .map)
+and the Jack compiler (VM line -> Jack file/line/subroutine, .vmmap).
+
+A map is a sorted list of entries (key, file, line, scope). An entry covers
+the keys from its own up to the next entry's; file "" marks keys without a
+source, like the bootstrap or the shared routines.
+
+    header      : magic "SMAP", u16 version, u16 checkpoint interval,
+                  u32 entry count, u32 name count, u32 checkpoint count
+    names       : per name u16 length, utf-8 bytes. Name 0 is always ""
+    checkpoints : per checkpoint u32 key, u32 offset into the entries
+    entries     : per entry varint key delta, varint file name,
+                  zigzag varint line delta, varint scope name
+
+Deltas are taken from the previous entry, except at every `interval`-th
+entry, which starts a checkpoint and is encoded against 0. A lookup reads
+the header, names and checkpoints, bisects the checkpoints and decodes at
+most `interval` entries, so the entries are never parsed as a whole.
+"""
+
+import mmap
+import struct
+from bisect import bisect_right
+from typing import Dict, Iterator, List, NamedTuple, Tuple, Union
+
+MAGIC = b"SMAP"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIII")
+CHECKPOINT = struct.Struct("<II")
+DEFAULT_INTERVAL = 64
+
+
+class Entry(NamedTuple):
+    key: int
+    file: str
+    line: int
+    scope: str
+
+
+class SourceLine(str):
+    """An output line that starts the code of the source line in `origin`."""
+
+    def __new__(cls, line: str, origin: Tuple[str, int, str]) -> "SourceLine":
+        self = super().__new__(cls, line)
+        self.origin = origin
+        return self
+
+    def __reduce__(self):
+        return SourceLine, (str(self), self.origin)
+
+
+def origin_of(line: str) -> Union[Tuple[str, int, str], None]:
+    return getattr(line, "origin", None)
+
+
+def with_origin(line: str, origin: Union[Tuple[str, int, str], None]) -> str:
+    """`line` tagged with `origin`, unless it has an origin of its own."""
+    if origin is None or origin_of(line) is not None:
+        return line
+    return SourceLine(line, origin)
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, offset: int) -> Tuple[int, int]:
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+class SourceMapWriter:
+    """Collects entries in key order and writes them with write()."""
+
+    def __init__(self, interval: int = DEFAULT_INTERVAL) -> None:
+        self.interval = interval
+        self.entries: List[Tuple[int, int, int, int]] = []
+        self.names: Dict[str, int] = {"": 0}
+
+    def add(self, key: int, file: str, line: int, scope: str = "") -> None:
+        """Starts a new range at `key`. An entry at the same key replaces the last one."""
+        entry = (key, self._name(file), line, self._name(scope))
+        if self.entries and self.entries[-1][0] == key:
+            self.entries[-1] = entry
+        elif not self.entries or self.entries[-1][1:] != entry[1:]:
+            assert not self.entries or self.entries[-1][0] < key
+            self.entries.append(entry)
+
+    def _name(self, name: str) -> int:
+        if name not in self.names:
+            self.names[name] = len(self.names)
+        return self.names[name]
+
+    def to_bytes(self) -> bytes:
+        data = bytearray()
+        checkpoints = []
+        last_key = last_line = 0
+        for i, (key, file, line, scope) in enumerate(self.entries):
+            if i % self.interval == 0:
+                checkpoints.append(CHECKPOINT.pack(key, len(data)))
+                last_key = last_line = 0
+            _write_varint(data, key - last_key)
+            _write_varint(data, file)
+            delta = line - last_line
+            _write_varint(data, delta << 1 if delta >= 0 else (-delta << 1) - 1)
+            _write_varint(data, scope)
+            last_key, last_line = key, line
+
+        names = bytearray()
+        for name in self.names:
+            encoded = name.encode("utf-8")
+            names += struct.pack("<H", len(encoded)) + encoded
+        header = HEADER.pack(
+            MAGIC, VERSION, self.interval, len(self.entries), len(self.names), len(checkpoints)
+        )
+        return header + names + b"".join(checkpoints) + data
+
+    def write(self, path: str) -> None:
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+
+class SourceMap:
+    """
+    A source map file, mapped read-only. Only the header, the names and the
+    checkpoints are read up front, lookup() decodes one checkpoint's entries.
+    """
+
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.interval, self.count, name_count, checkpoint_count = HEADER.unpack_from(
+            self.data
+        )
+        assert magic == MAGIC and version == VERSION
+        offset = HEADER.size
+        self.names: List[str] = []
+        for _ in range(name_count):
+            (length,) = struct.unpack_from("<H", self.data, offset)
+            offset += 2
+            self.names.append(self.data[offset : offset + length].decode("utf-8"))
+            offset += length
+        self.checkpoint_keys: List[int] = []
+        self.checkpoint_offsets: List[int] = []
+        for key, entry_offset in CHECKPOINT.iter_unpack(
+            self.data[offset : offset + checkpoint_count * CHECKPOINT.size]
+        ):
+            self.checkpoint_keys.append(key)
+            self.checkpoint_offsets.append(entry_offset)
+        self.entries_offset = offset + checkpoint_count * CHECKPOINT.size
+
+    def lookup(self, key: int) -> Union[Entry, None]:
+        """The entry whose range holds `key`, None before the first entry."""
+        checkpoint = bisect_right(self.checkpoint_keys, key) - 1
+        if checkpoint < 0:
+            return None
+        found = None
+        for entry in self._decode(checkpoint):
+            if entry.key > key:
+                break
+            found = entry
+        return found
+
+    def __iter__(self) -> Iterator[Entry]:
+        for checkpoint in range(len(self.checkpoint_keys)):
+            yield from self._decode(checkpoint)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _decode(self, checkpoint: int) -> Iterator[Entry]:
+        offset = self.entries_offset + self.checkpoint_offsets[checkpoint]
+        count = min(self.interval, self.count - checkpoint * self.interval)
+        key = line = 0
+        for _ in range(count):
+            delta, offset = _read_varint(self.data, offset)
+            key += delta
+            file, offset = _read_varint(self.data, offset)
+            delta, offset = _read_varint(self.data, offset)
+            line += delta >> 1 if delta & 1 == 0 else -((delta + 1) >> 1)
+            scope, offset = _read_varint(self.data, offset)
+            yield Entry(key, self.names[file], line, self.names[scope])
+
+    def close(self) -> None:
+        self.data.close()
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Dict, List, Union
+from .parser import Command, Parser
+from .code_writer import CodeWriter
+from .binary import HackObject
+from .cache import ObjectCache
+from .optimizer import ARITHMETIC_COMMANDS
+from time import perf_counter
+
+# verbosity levels: nothing, a summary (vm2hack.py), every VM command
+QUIET = 0
+NORMAL = 1
+VERBOSE = 2
+
+
+def translate(
+    vm_files: List[str],
+    asm_file: str,
+    verbosity: int = QUIET,
+    jobs: Union[int, None] = 1,
+    cache_dir: Union[str, None] = None,
+    **options,
+) -> CodeWriter:
+    """
+    Translates `vm_files` into one assembly file. With verbosity VERBOSE
+    every VM command is printed, otherwise nothing is. The seconds spent
+    parsing (reading included), generating code and writing the output
+    end up in the returned CodeWriter's timings.
+
+    Every file is translated on its own by translate_file(), on a process
+    pool of `jobs` workers when that is not 1 (None for one per CPU). The
+    results are linked after the bootstrap in the order of `vm_files`, so
+    the output does not depend on the number of workers.
+
+    With a `cache_dir` ("" for the default directory), translated files are
+    kept in an ObjectCache and only files whose source or options changed
+    are parsed and translated again. Inlining and dead function
+    elimination depend on the whole program, so with them every file is
+    still parsed, and a file's object is only reused when they leave the
+    same commands in it.
+    """
+    start = perf_counter()
+    code_writer = CodeWriter(asm_file, **options)
+    cache = ObjectCache(cache_dir or None) if cache_dir is not None else None
+    code_writer.cache = cache
+    units: List[Union[CodeWriter, None]] = [None] * len(vm_files)
+    keys: List[Union[str, None]] = [None] * len(vm_files)
+    if cache is not None:
+        sources = [read_source(vm_file) for vm_file in vm_files]
+    whole_program = code_writer.inliner is not None or code_writer.eliminator is not None
+    if cache is not None and not whole_program:
+        for i, vm_file in enumerate(vm_files):
+            keys[i] = cache.key(vm_file, sources[i], options)
+            units[i] = cache.get(keys[i], asm_file, options)
+        missing = [i for i, unit in enumerate(units) if unit is None]
+    else:
+        missing = list(range(len(vm_files)))
+    files = [read_commands(Parser(vm_files[i]), verbosity) for i in missing]
+    code_writer.timings["parse"] += perf_counter() - start
+
+    start = perf_counter()
+    if code_writer.inliner is not None:
+        file_names = [os.path.basename(vm_file).removesuffix(".vm") for vm_file in vm_files]
+        files = code_writer.inliner.inline(files, file_names)
+    if code_writer.eliminator is not None:
+        files = code_writer.eliminator.eliminate(files)
+    if cache is not None and whole_program:
+        for i, commands in enumerate(files):
+            rewritten = "\n".join(f"{command.line_number}:{command}" for command in commands)
+            keys[i] = cache.key(vm_files[i], sources[i], options, rewritten)
+            units[i] = cache.get(keys[i], asm_file, options)
+        files = [files[i] for i in range(len(vm_files)) if units[i] is None]
+        missing = [i for i, unit in enumerate(units) if unit is None]
+    translate_one = partial(translate_file, asm_file=asm_file, options=options)
+    missing_files = [vm_files[i] for i in missing]
+    if jobs == 1 or len(missing) < 2:
+        translated = list(map(translate_one, missing_files, files))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            translated = list(executor.map(translate_one, missing_files, files))
+    for i, unit in zip(missing, translated):
+        units[i] = unit
+        if cache is not None:
+            cache.put(keys[i], unit)
+
+    code_writer.writeInit()
+    for unit in units:
+        code_writer.link(unit.output, unit.used_trampolines, unit.hack_object)
+        if code_writer.vm_optimizer is not None:
+            code_writer.vm_optimizer.merge(unit.vm_optimizer)
+        if code_writer.optimizer is not None:
+            code_writer.optimizer.merge(unit.optimizer)
+
+    code_writer.close()
+    code_writer.timings["codegen"] += perf_counter() - start - code_writer.timings["io"]
+    return code_writer
+
+
+def translate_file(vm_file: str, commands: List[Command], asm_file: str, options: dict) -> CodeWriter:
+    """
+    Translates the commands of one VM file with a CodeWriter of its own.
+    The lines end up in its output, to be linked, nothing is written.
+    """
+    code_writer = CodeWriter(asm_file, **options)
+    code_writer.setVmFile(vm_file)
+    if code_writer.vm_optimizer is not None:
+        commands = code_writer.vm_optimizer.optimize(commands)
+    for command in commands:
+        if code_writer.source_map:
+            code_writer.setSource(command.line_number)
+        write_command(code_writer, command)
+    code_writer.output = code_writer.takeLines()
+    if code_writer.binary:
+        code_writer.hack_object = HackObject.encode(code_writer.output)
+    return code_writer
+
+
+COMMAND_WRITERS: Dict[str, Callable[[CodeWriter, Command], None]] = {
+    **{
+        command: lambda code_writer, command: code_writer.writeArithmetic(command.kind)
+        for command in ARITHMETIC_COMMANDS
+    },
+    "push": lambda code_writer, command: code_writer.writePushPop("push", *command.args),
+    "pop": lambda code_writer, command: code_writer.writePushPop("pop", *command.args),
+    "label": lambda code_writer, command: code_writer.writeLabel(*command.args),
+    "goto": lambda code_writer, command: code_writer.writeGoto(*command.args),
+    "if-goto": lambda code_writer, command: code_writer.writeIf(*command.args),
+    "call": lambda code_writer, command: code_writer.writeCall(*command.args),
+    "return": lambda code_writer, command: code_writer.writeReturn(),
+    "function": lambda code_writer, command: code_writer.writeFunction(*command.args),
+    "move": lambda code_writer, command: code_writer.writeMove(*command.args),
+    "push-op": lambda code_writer, command: code_writer.writePushArithmetic(*command.args),
+}
+
+
+def read_source(vm_file: str) -> bytes:
+    with open(vm_file, "rb") as f:
+        return f.read()
+
+
+def read_commands(parser: Parser, verbosity: int = QUIET) -> List[Command]:
+    if verbosity >= VERBOSE:
+        for command in parser.commands:
+            print(f"idx: {command.line_number:05d} line: '{command}'")
+    return list(parser.commands)
+
+
+def write_command(code_writer: CodeWriter, command: Command) -> None:
+    COMMAND_WRITERS[command.kind](code_writer, command)
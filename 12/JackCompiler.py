@@ -5,6 +5,12 @@ import shutil
 
 sys.path.append(os.getcwd())
 
+ROOT_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..")
+# vm2hack of 08, for the source map format of --source-map, and the
+# assembler of 06 it needs
+sys.path.append(os.path.join(ROOT_DIR, "08"))
+sys.path.append(os.path.join(ROOT_DIR, "06"))
+
 from typing import List
 from JackCompiler import CompilationEngine
 
@@ -25,7 +31,7 @@ def copy_os_vms(path: str):
             print(f"    copied OS vm file: {os.path.join(path, os_vm_file)}")
 
 
-def compile(path: str):
+def compile(path: str, source_map: bool = False):
 
     assert os.path.exists(path)
 
@@ -51,14 +57,19 @@ def compile(path: str):
         print(f"  {jack_files[i]}")
         print("vm out file: ")
         print(f"  {vm_files[i]}")
+        if source_map:
+            print("vm map out file: ")
+            print(f"  {vm_files[i].replace('.vm', '.vmmap')}")
 
-        engine = CompilationEngine(jack_files[i], vm_files[i])
+        engine = CompilationEngine(jack_files[i], vm_files[i], source_map)
         engine.compile()
         # engine.write()
 
 if __name__ == '__main__':
 
     arguments = sys.argv[1:]
+    source_map = "--source-map" in arguments
+    arguments = [argument for argument in arguments if not argument.startswith("-")]
 
     if len(arguments) < 1:
         print("no path in argument")
@@ -77,4 +88,4 @@ if __name__ == '__main__':
     if path != os_path:
         copy_os_vms(path)
         
-    compile(path)
+    compile(path, source_map)
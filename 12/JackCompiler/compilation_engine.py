@@ -281,7 +281,8 @@ class ExpressionList:
             expression.writeVMCodes(st, writer)
 
 class LetStatement:
-    def __init__(self, varName: str, expression: Expression, arrayRefExpression: Expression = None) -> None:
+    def __init__(self, varName: str, expression: Expression, arrayRefExpression: Expression = None, line: int = 0) -> None:
+        self.line = line
         self.varName = varName
         self.expression = expression
         self.arrayRefExpression = arrayRefExpression
@@ -337,7 +338,8 @@ class IfStatement:
 
     LABEL_INDEX = 0
 
-    def __init__(self, expression: Expression, statements: Statements, elseStatements: Statements = None) -> None:
+    def __init__(self, expression: Expression, statements: Statements, elseStatements: Statements = None, line: int = 0) -> None:
+        self.line = line
         self.expression: Expression = expression
         self.statements: Statements = statements
         self.elseStatements: Statements = elseStatements
@@ -368,17 +370,20 @@ class IfStatement:
         writer.writeArithmetic(ArithmeticCommand.NOT)
         writer.writeIf(label1)
         self.statements.writeVMCodes(st, writer)
+        writer.setSource(self.line)
         writer.writeGoto(label2)
         writer.writeLabel(label1)
         if self.elseStatements is not None:
             self.elseStatements.writeVMCodes(st, writer)
+            writer.setSource(self.line)
         writer.writeLabel(label2)
 
 class WhileStatement:
 
     LABEL_INDEX = 0
 
-    def __init__(self, expression: Expression, statements: Statements) -> None:
+    def __init__(self, expression: Expression, statements: Statements, line: int = 0) -> None:
+        self.line = line
         self.expression = expression
         self.statements = statements
 
@@ -407,12 +412,14 @@ class WhileStatement:
         writer.writeArithmetic(ArithmeticCommand.NOT)
         writer.writeIf(label2)
         self.statements.writeVMCodes(st, writer)
+        writer.setSource(self.line)
         writer.writeGoto(label1)
         writer.writeLabel(label2)
 
 class DoStatement:
 
-    def __init__(self, subroutineCall: SubroutineCall) -> None:
+    def __init__(self, subroutineCall: SubroutineCall, line: int = 0) -> None:
+        self.line = line
         self.subroutineCall = subroutineCall
 
     def toXMLElement(self) -> ET.Element:
@@ -429,7 +436,8 @@ class DoStatement:
 
 
 class ReturnStatement:
-    def __init__(self, expression: Expression = None) -> None:
+    def __init__(self, expression: Expression = None, line: int = 0) -> None:
+        self.line = line
         self.expression = expression
 
     def toXMLElement(self) -> ET.Element:
@@ -459,6 +467,7 @@ class Statements:
     
     def writeVMCodes(self, st: SymbolTable, writer: VMWriter) -> None:
         for statement in self.statements:
+            writer.setSource(statement.line)
             statement.writeVMCodes(st, writer)    
 
 class ClassVarDec:
@@ -572,8 +581,10 @@ class SubroutineDec:
         type: str,
         identifier: str,
         parameterList: ParameterList,
-        subroutineBody: SubroutineBody
+        subroutineBody: SubroutineBody,
+        line: int = 0
     ) -> None:
+        self.line = line
         self.keyword = keyword
         self.type = type
         self.identifier = identifier
@@ -604,6 +615,7 @@ class SubroutineDec:
         for varDec in self.subroutineBody.getVarDecList():
             varDec.writeVMCodes(st, writer)
 
+        writer.setSource(self.line, f"{st.className()}.{st.subroutineName()}")
         writer.writeFunction(
             f"{st.className()}.{st.subroutineName()}", st.varCount(SymbolKind.VAR)
         )
@@ -647,11 +659,12 @@ class Class:
 
 class CompilationEngine:
 
-    def __init__(self, jack_file: str, vm_file: str) -> None:
+    def __init__(self, jack_file: str, vm_file: str, source_map: bool = False) -> None:
         self.jack_file = jack_file
         self.vm_file = vm_file
         self.tokenizer = JackTokenizer(jack_file)
-        self.vm_writer = VMWriter(vm_file)
+        # with source_map, the VM lines are mapped back to jack_file in a .vmmap
+        self.vm_writer = VMWriter(vm_file, jack_file if source_map else None)
         self.xml_file = vm_file.replace(".vm", ".xml")
         self.tree = ET.ElementTree(ET.Element("classes"))
         self.tokens = ET.ElementTree(ET.Element("tokens"))
@@ -704,6 +717,7 @@ class CompilationEngine:
         # ('constructor' | 'function' | 'method' ) ('void' | type) subroutineName '(' parameterList ')'
         assert self.tokenizer.keyword() in ["constructor", "function", "method"]
 
+        line = self.tokenizer.lineNumber()
         cfm = self.tokenizer.keyword()
         self.tokenizer.advance()
 
@@ -734,7 +748,7 @@ class CompilationEngine:
         self.tokenizer.advance()
 
         subroutineBody = SubroutineBody(varDecs, statements)
-        return SubroutineDec(cfm, type, subroutineName, paramList, subroutineBody)
+        return SubroutineDec(cfm, type, subroutineName, paramList, subroutineBody, line)
 
     def compileParameterList(self) -> ParameterList:
         assert self.tokenizer.isSymbol() and self.tokenizer.symbol() == '('
@@ -808,6 +822,7 @@ class CompilationEngine:
 
     def compileLet(self) -> LetStatement:
         assert self.tokenizer.isKeyword() and self.tokenizer.keyword() == "let"
+        line = self.tokenizer.lineNumber()
         self.tokenizer.advance()
         varName = self.tokenizer.identifier()
         self.tokenizer.advance()
@@ -825,10 +840,11 @@ class CompilationEngine:
 
         assert self.tokenizer.isSymbol() and self.tokenizer.symbol() == ";"
         self.tokenizer.advance()
-        return LetStatement(varName, expression, arrayRefExpression)
+        return LetStatement(varName, expression, arrayRefExpression, line)
 
     def compileIf(self) -> IfStatement:
         assert self.tokenizer.isKeyword() and self.tokenizer.keyword() == "if"
+        line = self.tokenizer.lineNumber()
         self.tokenizer.advance()
         assert self.tokenizer.isSymbol() and self.tokenizer.symbol() == "("
         self.tokenizer.advance()
@@ -850,10 +866,11 @@ class CompilationEngine:
             assert self.tokenizer.isSymbol() and self.tokenizer.symbol() == "}"
             self.tokenizer.advance()
 
-        return IfStatement(expression, statements, elseStatements)
+        return IfStatement(expression, statements, elseStatements, line)
 
     def compileWhile(self) -> WhileStatement:
         assert self.tokenizer.isKeyword() and self.tokenizer.keyword() == "while"
+        line = self.tokenizer.lineNumber()
         self.tokenizer.advance()
         assert self.tokenizer.isSymbol() and self.tokenizer.symbol() == "("
         self.tokenizer.advance()
@@ -866,10 +883,11 @@ class CompilationEngine:
         assert self.tokenizer.isSymbol() and self.tokenizer.symbol() == "}"
         self.tokenizer.advance()
 
-        return WhileStatement(expression, statements)
+        return WhileStatement(expression, statements, line)
 
     def compileDo(self) -> DoStatement:
         assert self.tokenizer.isKeyword() and self.tokenizer.keyword() == "do"
+        line = self.tokenizer.lineNumber()
         self.tokenizer.advance()
         ident1 = self.tokenizer.identifier()
         self.tokenizer.advance()
@@ -888,20 +906,21 @@ class CompilationEngine:
         self.tokenizer.advance()
 
         if ident2 is not None:
-            return DoStatement(SubroutineCall(ident2, expressionList, ident1))
+            return DoStatement(SubroutineCall(ident2, expressionList, ident1), line)
         else:
-            return DoStatement(SubroutineCall(ident1, expressionList))
+            return DoStatement(SubroutineCall(ident1, expressionList), line)
 
     def compileReturn(self) -> ReturnStatement:
         assert self.tokenizer.isKeyword() and self.tokenizer.keyword() == "return"
+        line = self.tokenizer.lineNumber()
         self.tokenizer.advance()
         if (self.tokenizer.isSymbol() and self.tokenizer.symbol() == ";"):
             self.tokenizer.advance()
-            return ReturnStatement(None)
+            return ReturnStatement(None, line)
         expression = self.compileExpression()
         assert self.tokenizer.isSymbol() and self.tokenizer.symbol() == ";"
         self.tokenizer.advance()
-        return ReturnStatement(expression)
+        return ReturnStatement(expression, line)
 
     def compileExpression(self) -> Expression:
         term = self.compileTerm()
@@ -142,6 +142,8 @@ class JackTokenizer:
     def __init__(self, jack_file: str) -> None:
         self.jack_file: str = jack_file
         self.tokens: List[Token] = []
+        # line in jack_file of every token, for source maps
+        self.token_lines: List[int] = []
 
         self.stringValIdx = 0
         self.stringVals = {}
@@ -153,7 +155,7 @@ class JackTokenizer:
         while(comm_start >= 0):
             comm_end = content[comm_start+2:].find("*/")
             assert comm_end >= 0 and (comm_start + 2 + comm_end) < len(content)
-            lfs = content[comm_start+2:comm_end-1].count('\n')
+            lfs = content[comm_start+2:comm_start+2+comm_end].count('\n')
             content = content[0:comm_start] + " " + "\n"*lfs + content[comm_start + 2 + comm_end+2:]
             # print(f"comm_start: {comm_start}, comm_end: {comm_end}")
             comm_start = content.find("/*")
@@ -184,7 +186,7 @@ class JackTokenizer:
         for symbol in [s.value.value() for s in Symbol]:
             content = content.replace(symbol, f" {symbol} ")
 
-        for line in content.splitlines():
+        for line_number, line in enumerate(content.splitlines(), 1):
             if len(line) == 0:
                 continue
 
@@ -199,6 +201,7 @@ class JackTokenizer:
             for curr_token in curr_tokens:
                 # print(f"line: '{' '.join(curr_tokens)}', token: '{curr_token}'")
                 self.tokens.append(Token.create(curr_token))
+                self.token_lines.append(line_number)
 
         # for token in self.tokens:
         #     print(token)
@@ -214,6 +217,10 @@ class JackTokenizer:
         self.token = self.tokens[self.token_index]
         self.token_index = self.token_index + 1
 
+    def lineNumber(self) -> int:
+        assert self.token is not None
+        return self.token_lines[self.token_index - 1]
+
     def tokenType(self) -> str:
         assert self.token is not None
         return self.token.tokenType().value
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+import os
 from typing import List
 from enum import Enum
 
@@ -26,18 +27,43 @@ class ArithmeticCommand(Enum):
 
 class VMWriter:
 
-    def __init__(self, vm_file: str) -> None:
+    def __init__(self, vm_file: str, jack_file: str = None) -> None:
         self.vm_file = vm_file
         self.f = open(vm_file, "wt")
+        self.line_count = 0
+        # with a jack_file, the VM lines written after setSource() are mapped
+        # to its Jack line and subroutine, close() writes the map to a .vmmap
+        self.jack_file = jack_file
+        self.source_map = None
+        self.subroutine = ""
+        if jack_file is not None:
+            # needs vm2hack of 08 and the assembler of 06 on sys.path, see JackCompiler.py
+            from vm2hack.source_map import SourceMapWriter
+            self.source_map = SourceMapWriter()
 
     def close(self) -> None:
         self.f.close()
+        if self.source_map is not None:
+            self.source_map.write(self.mapFile())
+
+    def mapFile(self) -> str:
+        return self.vm_file.removesuffix(".vm") + ".vmmap"
+
+    def setSource(self, line: int, subroutine: str = None) -> None:
+        """The next VM line written starts the code of `line` in the Jack file."""
+        if self.source_map is None:
+            return
+        if subroutine is not None:
+            self.subroutine = subroutine
+        self.source_map.add(self.line_count + 1, os.path.basename(self.jack_file), line, self.subroutine)
 
     def _write_line(self, code: str) -> None:
         self.f.write(f"{code}\n")
+        self.line_count += 1
 
     def _write_lines(self, codes: List[str]) -> None:
         self.f.writelines("\n".join(codes) + "\n")
+        self.line_count += len(codes)
 
     def writePush(self, segment: Segment, index: int) -> None:
         self._write_line(f"push {segment.value} {index}")